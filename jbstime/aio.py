@@ -0,0 +1,335 @@
+import asyncio
+from datetime import datetime
+
+from . import api, catalog, config, trace
+from .dates import date_fmt
+from .error import Error
+from .req import SITE
+
+# aiohttp is optional (pip install jbstime[aio]), so it's only imported when a
+# Session is opened
+
+
+class APIError(Exception):
+  """
+    Something the command line would report and exit for. code is the exit
+    code it would use.
+  """
+
+  def __init__(self, message, code):
+    super().__init__(message)
+    self.code = code
+
+
+async def gather(aws, limit=None):
+  """
+    Awaits every awaitable in aws concurrently, but no more than limit at
+    once, and returns their results in order.
+  """
+  aws = list(aws)
+  if not limit:
+    return await asyncio.gather(*aws)
+
+  semaphore = asyncio.Semaphore(limit)
+
+  async def bounded(aw):
+    async with semaphore:
+      return await aw
+
+  return await asyncio.gather(*(bounded(aw) for aw in aws))
+
+
+class Session:
+  """
+    An asyncio connection to the timesheet site, for programs which already
+    run an event loop:
+
+      async with aio.Session() as session:
+        timesheets = await session.list()
+        await aio.gather((t.reload() for t in timesheets.values()), limit=8)
+
+    Every request goes through one aiohttp connection pool, with no more than
+    limit in flight at once, and the login happens once, the first time it's
+    needed. Pages are parsed by the same functions as the blocking API, and
+    the index and project list are kept once they're loaded. Unlike the
+    blocking API, nothing is saved to the .jbstime directory, and problems are
+    raised as APIError rather than printed.
+  """
+
+  def __init__(self, username=None, password=None, limit=4, site=SITE):
+    self.username = username
+    self.password = password
+    self.limit = limit
+    self.site = site
+
+    self._http = None
+    self._semaphore = asyncio.Semaphore(limit)
+    self._login_lock = asyncio.Lock()
+    self._logged_in = False
+
+    self._timesheets = None
+    self._pto = None
+    self._holidays = None
+    self._projects = None
+    self._project_index = None
+
+  async def __aenter__(self):
+    await self.open()
+    return self
+
+  async def __aexit__(self, *exc):
+    await self.close()
+
+  async def open(self):
+    if self._http is not None:
+      return
+
+    try:
+      import aiohttp
+    except ImportError:
+      raise ImportError('The async API needs aiohttp; install jbstime[aio]')
+
+    connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=60)
+    self._http = aiohttp.ClientSession(self.site, connector=connector, headers={'Accept-Encoding': 'gzip, deflate'})
+
+  async def close(self):
+    if self._http is not None:
+      await self._http.close()
+      self._http = None
+
+  async def _request(self, method, url, **kw):
+    """
+      Sends a request, returning the page and its cookies as a dict.
+    """
+    await self.open()
+    async with self._semaphore:
+      with trace.span(f'{method} {url}') as span:
+        async with self._http.request(method, url, **kw) as r:
+          # The pages are UTF-8 when they don't say, which saves guessing
+          text = await r.text(encoding=r.charset or 'utf-8')
+          span['status'] = r.status
+          cookies = {name: morsel.value for name, morsel in r.cookies.items()}
+
+    trace.count('http requests')
+    trace.count('http bytes', len(text))
+    if r.status >= 400:
+      raise APIError(f'{method} {url} failed: {r.status} {r.reason}', Error.UNEXPECTED_EXCEPTION)
+
+    return text, cookies
+
+  async def get(self, url, check_login=True):
+    if check_login:
+      await self.login()
+
+    text, cookies = await self._request('GET', url)
+    return text
+
+  async def post(self, url, data, referer=None, xhr=False, check_login=True):
+    """
+      Posts a form with the CSRF token from the referer page, like req.post.
+    """
+    if check_login:
+      await self.login()
+
+    referer = referer or url
+    text, cookies = await self._request('GET', referer)
+    token = cookies['csrftoken']
+
+    data = {name: str(value) for name, value in data.items()}
+    data['csrf_token'] = token
+    data['csrfmiddlewaretoken'] = token
+    headers = {
+      'X-CSRFToken': token,
+      'Referer': self.site + referer,
+    }
+    if xhr:
+      headers['X-Requested-With'] = 'XMLHttpRequest'
+
+    text, cookies = await self._request('POST', url, data=data, headers=headers)
+    return text
+
+  async def login(self):
+    async with self._login_lock:
+      if self._logged_in:
+        return
+
+      conf = config.load_config()
+      username = self.username or conf['username']
+      password = self.password or conf['password']
+      if not username or not password:
+        raise APIError('No username or password. Pass them to the Session or run `jbstime config`.', Error.CONFIG_ERROR)
+
+      with trace.span('login'):
+        text = await self.post('/accounts/login/', {
+          'username': username,
+          'password': password,
+        }, check_login=False)
+
+      if 'Your username and password didn\'t match' in text:
+        raise APIError('Login failed. Check your username and password.', Error.LOGIN_FAILED)
+
+      self._logged_in = True
+
+  async def _load(self):
+    text = await self.get('/?all=1')
+
+    with trace.span('parse index', bytes=len(text)):
+      timesheets, self._pto, upcoming = api._parse_index(text)
+
+    self._timesheets = {
+      d: Timesheet(self, t.id, t.date, t.hours, t.work_hours, t.locked)
+      for d, t in timesheets.items()
+    }
+
+    today = datetime.now().date()
+    self._holidays = {k: v for k, v in config.load_holidays().items() if k <= today}
+    self._holidays.update(upcoming)
+
+  async def list(self):
+    """
+      Returns the timesheets by date, newest first.
+    """
+    if self._timesheets is None:
+      await self._load()
+
+    return self._timesheets
+
+  async def latest(self):
+    timesheets = await self.list()
+    if not timesheets:
+      raise APIError('No timesheets found', Error.TIMESHEET_MISSING)
+
+    return next(iter(timesheets.values()))
+
+  async def create(self, date):
+    text = await self.post('/timesheet/', {
+      'newsheet': date.strftime('%m/%d/%Y'),
+    }, referer='/accounts/login/')
+
+    if 'That timesheet already exists' in text:
+      raise APIError(f'A timesheet already exists for {date_fmt(date)}', Error.TIMESHEET_EXISTS)
+
+    # The index needs to be loaded again to pick up the new timesheet
+    self._timesheets = None
+
+  async def pto(self):
+    if self._pto is None:
+      await self._load()
+
+    return self._pto
+
+  async def list_holidays(self):
+    if self._holidays is None:
+      await self._load()
+
+    return self._holidays
+
+  async def list_projects(self):
+    if self._projects is None:
+      latest = await self.latest()
+      await latest.reload()
+
+    return self._projects
+
+  async def find_project(self, name):
+    projects = list((await self.list_projects()).values())
+    if self._project_index is None:
+      self._project_index = catalog.ProjectIndex([p.name for p in projects])
+
+    matches = self._project_index.match(name)
+    if len(matches) == 1:
+      return projects[matches[0]]
+
+    if matches:
+      names = ', '.join(projects[i].name for i in matches)
+      raise APIError(f'Ambiguous project: {name} could be any of {names}', Error.INVALID_ARGUMENT)
+
+    raise APIError(f'Invalid project: {name}', Error.INVALID_ARGUMENT)
+
+  async def validate_item(self, project, hours, description):
+    p = await self.find_project(project)
+
+    try:
+      hours, description = api.check_item(hours, description)
+    except api.InvalidItem as e:
+      raise APIError(str(e), Error.INVALID_ARGUMENT)
+
+    return p, hours, description
+
+
+class Timesheet:
+  """
+    A timesheet from Session.list(). items is None until it's been loaded
+    with reload(), and again after anything is changed.
+  """
+
+  def __init__(self, session, id, date, hours, work_hours, locked):
+    self.session = session
+    self.id = id
+    self.date = date
+    self.hours = hours
+    self.work_hours = work_hours
+    self.locked = locked
+    self.items = None
+
+  def __eq__(self, o):
+    return isinstance(o, Timesheet) and o.id == self.id
+
+  def __hash__(self):
+    return int(self.id)
+
+  async def reload(self):
+    text = await self.session.get(f'/timesheet/{self.id}/')
+
+    with trace.span('parse timesheet', bytes=len(text)):
+      self.items, projects = api._parse_timesheet(text)
+
+    self.hours = sum(i.hours for i in self.items)
+    self.session._projects = projects
+    self.session._project_index = None
+    return self.items
+
+  async def add_item(self, date, project, hours, description, merge=True):
+    """
+      Adds an item. Like the add command, merge deletes the items with the
+      same date, project and description and adds their hours to this one.
+    """
+    p, hours, description = await self.session.validate_item(project, hours, description)
+
+    to_delete = []
+    if merge:
+      items = self.items if self.items is not None else await self.reload()
+      to_delete = [
+        i for i in items
+        if i.date == date and i.project.lower() == p.name.lower() and i.description == description
+      ]
+      hours += sum(i.hours for i in to_delete)
+
+      if hours > 99.0:
+        raise APIError(f'Merging this item with other items is too many hours: {hours}', Error.INVALID_ARGUMENT)
+
+    await asyncio.gather(*(self.delete_item(i.id) for i in to_delete))
+    await self.session.post(f'/timesheet/{self.id}/', {
+      'log_date': date.strftime('%m/%d/%Y'),
+      'project': p.id,
+      'hours_worked': hours,
+      'description': description,
+      'ticket': '',
+      'billing_type': 'M',
+      'parent_ticket': '',
+      'undefined': '',
+    }, xhr=True)
+    self.items = None
+
+  async def delete_item(self, item_id):
+    await self.session.post(f'/timesheet/{self.id}/', {
+      'id': item_id,
+      'action': 'delete',
+    }, xhr=True)
+    self.items = None
+
+  async def submit(self):
+    await self.session.post(f'/timesheet/{self.id}/', {
+      'action': 'finalize',
+    }, xhr=True)
+    self.locked = True
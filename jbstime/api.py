@@ -1,13 +1,13 @@
 from collections import namedtuple
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 import re
 import sys
+import threading
 
-from bs4 import BeautifulSoup
 import click
 
-from . import config, req
+from . import cache, catalog, config, req, search, trace
 from .dates import date_fmt, date_from_user_date, find_sunday
 from .error import Error
 
@@ -16,29 +16,333 @@ _timesheets = None
 _holidays = None
 _projects = None
 _pto = None
+_project_index = None
+
+# Whether the projects came from the catalog rather than a timesheet loaded
+# in this run, in which case they might be out of date
+_projects_saved = False
+
+# Held while a timesheet's loaded items are changed after a write
+_items_lock = threading.Lock()
+
+CHARSET = re.compile(r'charset=["\']?([\w-]+)', re.IGNORECASE)
+CSRF_INPUT = re.compile(req.CSRF_INPUT.pattern.encode())
 
 
 TimesheetItem = namedtuple('TimesheetItem', 'id hours date project description')
 PTO = namedtuple('PTO', 'balance cap earned used accrual')
 Project = namedtuple('Project', 'id name favorite')
+PTOSnapshot = namedtuple('PTOSnapshot', 'pto week locked fetched')
 
 
 def _clear():
-  global _timesheets, _projects, _holidays, _pto
+  global _timesheets, _projects, _holidays, _pto, _project_index, _projects_saved
   _timesheets = None
   _projects = None
+  _project_index = None
+  _projects_saved = False
   _holidays = None
   _pto = None
+  req.forget_prefetched()
+
+
+def prefetch(*urls):
+  """
+    Starts loading pages in the background, all at once. The next time one of
+    them is needed its response is used, unless something was written in the
+    meantime. Pages which turn out not to be needed are ignored.
+  """
+  req.login()
+  for url in urls:
+    req.prefetch(url, 'page')
+
+
+def prefetch_for(d=None):
+  """
+    Prefetches the index along with the timesheet covering a date (or the
+    latest one) if its id is known from an earlier run. Pages which are
+    already loaded are skipped.
+  """
+  weeks = catalog.week_dates()
+  week = find_sunday(d) if d else (weeks[0] if weeks else None)
+  week_id = catalog.week_id(week) if week else None
+  timesheet = _timesheets.get(week) if _timesheets and week else None
+
+  urls = [] if _timesheets is not None else ['/?all=1']
+  if week_id and not (timesheet and timesheet._items is not None):
+    urls.append(f'/timesheet/{week_id}/')
+
+  prefetch(*urls)
+
+
+def prefetch_for_write(*timesheets, load_items=True):
+  """
+    Starts loading the pages of timesheets which are about to be changed,
+    while the user is asked to confirm. A timesheet's page has its items
+    (unless load_items is False, or they're loaded already) and the CSRF
+    token for the first post, so one request covers both.
+  """
+  req.login()
+  for timesheet in timesheets:
+    url = f'/timesheet/{timesheet.id}/'
+    if load_items and timesheet._items is None:
+      req.prefetch(url, 'page', 'token')
+    else:
+      req.prefetch(url, 'token')
+
+
+def _get(url):
+  r = req.prefetched('page', url)
+  if r is not None:
+    trace.count('prefetch hits')
+    return r
+
+  return req.get(url)
+
+
+def _body(r):
+  """
+    Returns a response's body, as bytes, along with its encoding. The parser
+    decodes it itself, so requests never makes a decoded copy, and never
+    guesses the encoding of a page without a charset. Those are Django pages,
+    which are UTF-8. The body isn't copied, and the response is left as it
+    is, since a prefetched one can also be used for its CSRF token.
+  """
+  match = CHARSET.search(r.headers.get('Content-Type', ''))
+  if match:
+    encoding = match.group(1)
+  else:
+    encoding = 'utf-8'
+    trace.count('pages without a charset')
+
+  return r.content, encoding
+
+
+def _parse(markup, encoding=None):
+  # bs4 is imported here so that shell completion doesn't have to load it
+  from bs4 import BeautifulSoup
+
+  if encoding:
+    return BeautifulSoup(markup, 'html.parser', from_encoding=encoding)
+
+  return BeautifulSoup(markup, 'html.parser')
+
+
+def _parse_index(markup, encoding=None):
+  """
+    Parses the index page into the timesheets, the PTO information, and the
+    upcoming holidays. markup is bytes in the given encoding, or a str.
+  """
+  doc = _parse(markup, encoding)
+
+  timesheets = {}
+  for row in doc.find('table', attrs={'class': 'latest-timesheet-table'}).find_all('tr'):
+    data = row.find_all('td')
+    if not data:
+      continue
+
+    timesheet_date = datetime.strptime(data[1].contents[0][12:], '%m/%d/%Y').date()
+    timesheets[timesheet_date] = Timesheet(
+      id=data[5].find('a')['href'][11:-1],
+      date=timesheet_date,
+      hours=Decimal(data[2].contents[0]),
+      work_hours=Decimal(data[3].contents[0]),
+      locked=(data[0].find('span')['class'] + [None])[0] == 'locked',
+    )
+
+  pto = PTO(
+    balance=Decimal(doc.find('td', text='Previous PTO Balance').find_next_sibling('td').contents[0]),
+    cap=int(doc.find('td', text=re.compile(r'^PTO is capped at \d+ hours$')).contents[0][17:-6]),
+    earned=Decimal(doc.find('td', text='Total PTO Earned').find_next_sibling('td').contents[0]),
+    used=Decimal(doc.find('td', text='Total PTO Used').find_next_sibling('td').contents[0]),
+    accrual=int(doc.find('td', text='Current PTO Accrual Rate').find_next_sibling('td').contents[0].split(' ')[0])
+  )
+
+  holidays = {}
+  for td in doc.find('div', attrs={'class': 'ptoplaceholder'}).find_all('td'):
+    if td.contents[0] == 'Upcoming Company Holidays':
+      for holiday in td.find_next_sibling('td').find_all('p'):
+        h, d = holiday.contents[0].split(' - ')
+        holidays[datetime.strptime(d, '%m/%d/%Y').date()] = h
+
+  return timesheets, pto, holidays
+
+
+def _timesheet_rows(timesheets):
+  return [[t.id, t.date.isoformat(), str(t.hours), str(t.work_hours), t.locked] for t in timesheets.values()]
+
+
+def _timesheets_from_rows(rows):
+  timesheets = {}
+  for id, d, hours, work_hours, locked in rows:
+    timesheet_date = date.fromisoformat(d)
+    timesheets[timesheet_date] = Timesheet(id, timesheet_date, Decimal(hours), Decimal(work_hours), locked)
+
+  return timesheets
+
+
+def _item_rows(items):
+  return [[i.id, str(i.hours), i.date.isoformat(), i.project, i.description] for i in sorted(items)]
+
+
+def _items_from_rows(rows):
+  return set(
+    TimesheetItem(id, Decimal(hours), date.fromisoformat(d), project, description)
+    for id, hours, d, project, description in rows
+  )
+
+
+def _pto_from_row(row):
+  balance, cap, earned, used, accrual = row
+  return PTO(Decimal(balance), cap, Decimal(earned), Decimal(used), accrual)
+
+
+def _digest(content):
+  # The CSRF tokens are left out, since they're different every time. hashlib
+  # is imported here to keep it out of shell completion, like bs4.
+  import hashlib
+
+  return hashlib.blake2b(CSRF_INPUT.sub(b'', content), digest_size=16).hexdigest()
+
+
+def _saved_index(digest=None):
+  """
+    Returns what was saved the last time the index was loaded, or None if
+    nothing was. With a digest, it's only returned if the page was the same.
+  """
+  data = cache.load('index', format=cache.FORMAT)
+  if data and (digest is None or data['digest'] == digest):
+    return data
 
+  return None
+
+
+def _saved_items():
+  return cache.load('items', {'format': cache.FORMAT, 'weeks': {}, 'digests': {}}, format=cache.FORMAT)
+
+
+def _unchanged_timesheet(timesheet_date, digest):
+  """
+    Returns the items and projects saved the last time a timesheet was
+    loaded, if its page was the same then, or None if it has to be parsed.
+  """
+  week = timesheet_date.isoformat()
+  saved = _saved_items()
+  projects = catalog.load_projects(max_age=None)
+  if saved['digests'].get(week) != digest or projects is None:
+    return None
+
+  trace.count('pages unchanged')
+  return _items_from_rows(saved['weeks'][week]), {
+    name.lower(): Project(id, name, favorite) for id, name, favorite in projects[0]
+  }
+
+
+def _parse_timesheet_data(content, encoding):
+  # Runs in a worker process during a sync, so it returns plain data, which
+  # is cheap to send back
+  items, projects = _parse_timesheet(content, encoding)
+  return _digest(content), _item_rows(items), [[p.id, p.name, p.favorite] for p in projects.values()]
+
+
+def _parse_timesheet(markup, encoding=None):
+  """
+    Parses a timesheet page into its items and the list of projects. markup
+    is bytes in the given encoding, or a str.
+  """
+  doc = _parse(markup, encoding)
+
+  items = set()
+  for row in doc.find('div', attrs={'class': 'tableholder'}).find_all('tr'):
+    if not row.get('id'):
+      continue
+
+    items.add(TimesheetItem(
+      id=row.find('input', attrs={'name': 'id'})['value'],
+      hours=Decimal(row.find('input', attrs={'name': 'hours_worked'})['value']),
+      date=datetime.strptime(row.find('input', attrs={'name': 'log_date'})['value'], '%m/%d/%Y').date(),
+      project=row.find('select', attrs={'name': 'project'}).find('option', selected='selected').contents[0],
+      description=row.find('textarea', attrs={'name': 'description'}).contents[0]
+    ))
+
+  projects = {}
+  for option in doc.find('select', id='fav_projects').find_all('option'):
+    name = option.contents[0]
+    projects[name.lower()] = Project(
+      option['value'],
+      name,
+      option.get('selected') == 'selected'
+    )
+
+  return items, projects
+
+
+def list_projects(offline=False):
+  global _projects, _project_index, _projects_saved
 
-def list_projects():
   if _projects is None:
-    latest = Timesheet.latest()
-    latest.reload()
+    # Offline, the saved projects are used however old they are
+    cached = catalog.load_projects(max_age=None if offline else catalog.PROJECT_MAX_AGE)
+    if cached:
+      projects, _project_index = cached
+      _projects = {name.lower(): Project(id, name, favorite) for id, name, favorite in projects}
+      _projects_saved = True
+    elif offline:
+      click.echo('There is no saved project list to check against. Run `projects` while online first.', err=True)
+      sys.exit(Error.OFFLINE_UNAVAILABLE)
+    else:
+      latest = Timesheet.latest()
+      latest.reload()
 
   return _projects
 
 
+def _index(offline=False):
+  global _project_index
+
+  projects = list_projects(offline=offline)
+  if _project_index is None:
+    _project_index = catalog.ProjectIndex([p.name for p in projects.values()])
+
+  return list(projects.values()), _project_index
+
+
+def search_projects(search):
+  """
+    Returns the projects whose names contain the search string. If there are
+    none, returns projects with similar names instead.
+  """
+  projects, index = _index()
+  return [projects[i] for i in index.contains(search) or index.similar(search)]
+
+
+def find_project(name, offline=False):
+  projects, index = _index(offline=offline)
+  matches = index.match(name)
+  if len(matches) != 1 and _projects_saved and not offline:
+    # The project may have been added or renamed since the projects were
+    # saved, so they're loaded from the website before giving up
+    Timesheet.latest().reload()
+    projects, index = _index()
+    matches = index.match(name)
+
+  if len(matches) == 1:
+    return projects[matches[0]]
+
+  if matches:
+    click.echo(f'Ambiguous project: {name}', err=True)
+    click.echo('It could be any of:', err=True)
+    for i in matches:
+      click.echo(f'  {projects[i].name}', err=True)
+  else:
+    click.echo(f'Invalid project: {name}', err=True)
+    suggestions = index.similar(name)[:3]
+    if suggestions:
+      click.echo(f'Did you mean: {", ".join(projects[i].name for i in suggestions)}?', err=True)
+
+  sys.exit(Error.INVALID_ARGUMENT)
+
+
 def list_holidays():
   if _holidays is None:
     Timesheet._load()
@@ -53,6 +357,197 @@ def pto():
   return _pto
 
 
+def cached_pto(max_age=None):
+  data = _saved_index()
+  if not data:
+    return None
+
+  fetched = datetime.fromisoformat(data['fetched'])
+  if max_age is not None and datetime.now() - fetched > max_age:
+    return None
+
+  # The PTO is as of the latest timesheet, which comes first
+  id, week, hours, work_hours, locked = data['timesheets'][0]
+  return PTOSnapshot(
+    pto=_pto_from_row(data['pto']),
+    week=date.fromisoformat(week),
+    locked=locked,
+    fetched=fetched,
+  )
+
+
+def cached_items(timesheet_date):
+  rows = _saved_items()['weeks'].get(timesheet_date.isoformat())
+  return _items_from_rows(rows) if rows is not None else None
+
+
+def load_stale():
+  """
+    Loads the timesheets, PTO and holidays saved the last time the index was
+    fetched, without going to the website. Returns when they were fetched, or
+    None if nothing has been saved.
+  """
+  global _timesheets, _pto, _holidays
+
+  data = _saved_index()
+  if not data:
+    return None
+
+  _timesheets = _timesheets_from_rows(data['timesheets'])
+  _pto = _pto_from_row(data['pto'])
+  _holidays = config.load_holidays()
+  return datetime.fromisoformat(data['fetched'])
+
+
+def refresh():
+  """
+    Fetches the index and the latest timesheet, updating everything saved
+    from them.
+  """
+  Timesheet._load()
+  Timesheet.latest().reload()
+
+
+def sync(timesheets):
+  """
+    Reloads timesheets, yielding each one in order as it's done. The pages
+    are fetched concurrently and, when there are enough of them, parsed in a
+    pool of processes. Once they all are, their items are saved and indexed
+    in one go.
+  """
+  global _projects, _project_index, _projects_saved
+
+  # The pipeline brings in multiprocessing, which only a sync needs
+  from . import pipeline
+
+  saved = _saved_items()
+  by_url = {f'/timesheet/{ts.id}/': ts for ts in timesheets}
+
+  def unchanged(url, content, encoding):
+    # Only the items are rebuilt, so the projects come from pages which did
+    # change, if any
+    digest = _digest(content)
+    if saved['digests'].get(by_url[url].date.isoformat()) != digest:
+      return None
+
+    trace.count('pages unchanged')
+    return digest, None, None
+
+  pages = pipeline.fetch_and_parse(by_url, lambda url: _body(_get(url)), _parse_timesheet_data, skip=unchanged)
+
+  changed = []
+  for url, (digest, items, projects) in pages:
+    timesheet = by_url[url]
+    timesheet._digest = digest
+    if items is None:
+      timesheet._items = _items_from_rows(saved['weeks'][timesheet.date.isoformat()])
+    else:
+      timesheet._items = _items_from_rows(items)
+      _projects = {name.lower(): Project(id, name, favorite) for id, name, favorite in projects}
+      _project_index = None
+      _projects_saved = False
+      changed.append(timesheet)
+
+    yield timesheet
+
+  if changed:
+    catalog.update(projects=_projects)
+    _record_items(*changed)
+
+
+def _record_index(digest, upcoming):
+  # Everything from the index page is saved in one file, which is also what
+  # the page is rebuilt from when it hasn't changed
+  cache.save('index', {
+    'format': cache.FORMAT,
+    'fetched': datetime.now().isoformat(),
+    'digest': digest,
+    'timesheets': _timesheet_rows(_timesheets),
+    'pto': [str(_pto.balance), _pto.cap, str(_pto.earned), str(_pto.used), _pto.accrual],
+    'holidays': {d.isoformat(): name for d, name in upcoming.items()},
+  })
+
+
+def cached_weeks():
+  return set(date.fromisoformat(d) for d in _saved_items()['weeks'])
+
+
+def _record_items(*timesheets):
+  with cache.lock:
+    history = _saved_items()
+    rows = {}
+    for ts in timesheets:
+      week = ts.date.isoformat()
+      rows[week] = _item_rows(ts._items)
+      if ts._digest is not None:
+        history['digests'][week] = ts._digest
+      else:
+        history['digests'].pop(week, None)
+
+    history['weeks'].update(rows)
+    cache.save('items', history)
+    search.index_weeks(rows)
+
+
+def item_matches(item, d, project, description):
+  """
+    Checks an item against a date (or None for any date), a lowercase project
+    name (or 'all'), and a lowercase description (or None for any).
+  """
+  if d and d != item.date:
+    return False
+
+  if project != 'all' and project != item.project.lower():
+    return False
+
+  return not description or description == item.description.lower()
+
+
+class InvalidItem(ValueError):
+  """
+    An item that can't be added. The message says why.
+  """
+
+
+def check_item(hours, description):
+  """
+    Checks an item's hours and description, returning the hours as a Decimal
+    and the description stripped. Raises InvalidItem with the reason if
+    either is no good.
+  """
+  try:
+    hours = Decimal(hours)
+  except InvalidOperation:
+    raise InvalidItem(f'Invalid hours: {hours}')
+
+  if -0.01 < hours < 0.01:
+    raise InvalidItem('Hours cannot be 0')
+
+  if hours < 0:
+    raise InvalidItem(f'Hours cannot be negative: {hours}')
+
+  if hours > 99.0:
+    raise InvalidItem(f'Too many hours: {hours}')
+
+  description = description.strip()
+  if not description:
+    raise InvalidItem('No description provided')
+
+  return hours, description
+
+
+def validate_item(project, hours, description, offline=False):
+  p = find_project(project, offline=offline)
+
+  try:
+    hours, description = check_item(hours, description)
+  except InvalidItem as e:
+    click.echo(str(e), err=True)
+    sys.exit(Error.INVALID_ARGUMENT)
+
+  return p, hours, description
+
+
 class Timesheet:
   def __init__(self, id, date, hours, work_hours, locked):
     self.id = id
@@ -63,6 +558,10 @@ class Timesheet:
     self._items = None
     self._locked = locked
 
+    # The digest of the page the items were loaded from, or None if they've
+    # been changed since
+    self._digest = None
+
   def __eq__(self, o):
     return isinstance(o, Timesheet) and o.id == self.id
 
@@ -80,54 +579,61 @@ class Timesheet:
   def _load(cls):
     global _holidays, _timesheets, _pto
 
-    r = req.get('/?all=1')
-
-    doc = BeautifulSoup(r.text, 'html.parser')
-
-    _timesheets = {}
-    for row in doc.find('table', attrs={'class': 'latest-timesheet-table'}).find_all('tr'):
-      data = row.find_all('td')
-      if not data:
-        continue
-
-      timesheet_date = datetime.strptime(data[1].contents[0][12:], '%m/%d/%Y').date()
-      _timesheets[timesheet_date] = Timesheet(
-        id=data[5].find('a')['href'][11:-1],
-        date=timesheet_date,
-        hours=Decimal(data[2].contents[0]),
-        work_hours=Decimal(data[3].contents[0]),
-        locked=(data[0].find('span')['class'] + [None])[0] == 'locked',
-      )
-
-    _pto = PTO(
-      balance=Decimal(doc.find('td', text='Previous PTO Balance').find_next_sibling('td').contents[0]),
-      cap=int(doc.find('td', text=re.compile(r'^PTO is capped at \d+ hours$')).contents[0][17:-6]),
-      earned=Decimal(doc.find('td', text='Total PTO Earned').find_next_sibling('td').contents[0]),
-      used=Decimal(doc.find('td', text='Total PTO Used').find_next_sibling('td').contents[0]),
-      accrual=int(doc.find('td', text='Current PTO Accrual Rate').find_next_sibling('td').contents[0].split(' ')[0])
-    )
-
-    today = datetime.now().date()
-    _holidays = {k: v for k, v in config.load_holidays().items() if k <= today}
-
-    for td in doc.find('div', attrs={'class': 'ptoplaceholder'}).find_all('td'):
-      if td.contents[0] == 'Upcoming Company Holidays':
-        for holiday in td.find_next_sibling('td').find_all('p'):
-          h, d = holiday.contents[0].split(' - ')
-          _holidays[datetime.strptime(d, '%m/%d/%Y').date()] = h
-
-    config.save_holidays(_holidays)
+    # The phase covers the fetch as well as the parse, which is timed on its
+    # own inside it
+    with trace.span('load index'):
+      r = _get('/?all=1')
+
+      with trace.span('parse index', bytes=len(r.content)):
+        content, encoding = _body(r)
+        digest = _digest(content)
+        saved = _saved_index(digest)
+        if saved:
+          trace.count('pages unchanged')
+          _timesheets = _timesheets_from_rows(saved['timesheets'])
+          _pto = _pto_from_row(saved['pto'])
+          upcoming = {date.fromisoformat(d): name for d, name in saved['holidays'].items()}
+        else:
+          _timesheets, _pto, upcoming = _parse_index(content, encoding)
+
+      catalog.update(weeks={d: t.id for d, t in _timesheets.items()})
+
+      today = datetime.now().date()
+      _holidays = {k: v for k, v in config.load_holidays().items() if k <= today}
+      _holidays.update(upcoming)
+      config.save_holidays(_holidays)
+
+      if _timesheets:
+        _record_index(digest, upcoming)
 
   @classmethod
-  def create(cls, date):
+  def create(cls, date, known=None):
+    """
+      Creates the timesheet for a week. known is the weeks which had
+      timesheets before, or None to use the ones loaded. Creates running at
+      the same time each clear what's loaded, so they should be given it.
+    """
+    global _timesheets
+
+    # A week that's there after a failed post, and wasn't before it, was
+    # created by it. Otherwise the post is sent again, and the website says
+    # if the week already exists.
+    before = known if known is not None else (set(_timesheets) if _timesheets is not None else None)
+
+    def created():
+      return before is not None and date not in before and date in _parse_index(*_body(req.get('/?all=1')))[0]
+
     r = req.post('/timesheet/', data={
       'newsheet': date.strftime('%m/%d/%Y'),
-    }, referer='/accounts/login/')
+    }, referer='/accounts/login/', verify=created)
 
-    if 'That timesheet already exists' in r.text:
+    if r is not None and b'That timesheet already exists' in r.content:
       click.echo(f'A timesheet already exists for {date_fmt(date)}', err=True)
       sys.exit(Error.TIMESHEET_EXISTS)
 
+    # The index needs to be loaded again to pick up the new timesheet
+    _timesheets = None
+
   @classmethod
   def latest(cls):
     timesheets = cls.list()
@@ -156,6 +662,11 @@ class Timesheet:
 
   @property
   def hours(self):
+    # After a change the total from the index is out of date, so it's added
+    # up from the items instead
+    if self._hours is None:
+      self._hours = sum(i.hours for i in self.items)
+
     return self._hours
 
   @property
@@ -170,103 +681,162 @@ class Timesheet:
     return self._items
 
   def submit(self):
+    def submitted():
+      timesheet = _parse_index(*_body(req.get('/?all=1')))[0].get(self.date)
+      return timesheet is not None and timesheet.locked
+
     req.post(f'/timesheet/{self.id}/', data={
       'action': 'finalize',
-    }, xhr=True)
+    }, xhr=True, verify=submitted)
+    self._locked = True
 
   def reload(self):
-    global _projects
-
-    r = req.get(f'/timesheet/{self.id}/')
-    doc = BeautifulSoup(r.text, 'html.parser')
-    self._items = set()
-    for row in doc.find('div', attrs={'class': 'tableholder'}).find_all('tr'):
-      if not row.get('id'):
-        continue
-
-      self._items.add(TimesheetItem(
-        id=row.find('input', attrs={'name': 'id'})['value'],
-        hours=Decimal(row.find('input', attrs={'name': 'hours_worked'})['value']),
-        date=datetime.strptime(row.find('input', attrs={'name': 'log_date'})['value'], '%m/%d/%Y').date(),
-        project=row.find('select', attrs={'name': 'project'}).find('option', selected='selected').contents[0],
-        description=row.find('textarea', attrs={'name': 'description'}).contents[0]
-      ))
-
-    _projects = {}
-    for option in doc.find('select', id='fav_projects').find_all('option'):
-      name = option.contents[0]
-      _projects[name.lower()] = Project(
-        option['value'],
-        name,
-        option.get('selected') == 'selected'
-      )
+    """
+      Loads the timesheet's items and the list of projects, and saves them for
+      the catalog, PTO ledger and search index.
+    """
+    global _projects, _project_index, _projects_saved
+
+    with trace.span('load timesheet'):
+      r = _get(f'/timesheet/{self.id}/')
+
+      with trace.span('parse timesheet', bytes=len(r.content)):
+        content, encoding = _body(r)
+        self._digest = _digest(content)
+        saved = _unchanged_timesheet(self.date, self._digest)
+        self._items, _projects = saved or _parse_timesheet(content, encoding)
+
+      _project_index = None
+      _projects_saved = False
+      catalog.update(projects=_projects)
+      # Items rebuilt from the saved ones are saved already
+      if not saved:
+        _record_items(self)
 
   def add_item(self, date, project, hours, description, fill=False, merge=True):
-    p = list_projects().get(project.lower())
-    if not p:
-      click.echo(f'Invalid project: {project}', err=True)
-      sys.exit(Error.INVALID_ARGUMENT)
-
-    try:
-      hours = Decimal(hours)
-    except InvalidOperation:
-      click.echo(f'Invalid hours: {hours}', err=True)
-      sys.exit(Error.INVALID_ARGUMENT)
-
-    if -0.01 < hours < 0.01:
-      click.echo('Hours cannot be 0', err=True)
-      sys.exit(Error.INVALID_ARGUMENT)
-
-    if hours < 0:
-      click.echo(f'Hours cannot be negative: {hours}', err=True)
-      sys.exit(Error.INVALID_ARGUMENT)
-
-    if hours > 99.0:
-      click.echo(f'Too many hours: {hours}', err=True)
-      sys.exit(Error.INVALID_ARGUMENT)
-
-    description = description.strip()
-    if not description:
-      click.echo('No description provided', err=True)
-      sys.exit(Error.INVALID_ARGUMENT)
-
-    if fill:
-      current_hours = sum(i.hours for i in self.items if i.date == date)
-      hours = min(hours, Decimal('8.0') - current_hours)
-      if hours < 0.01:
-        return current_hours
-
+    return self.add_items([(date, project, hours, description)], fill=fill, merge=merge)[0]
+
+  def add_items(self, entries, fill=False, merge=True, before_send=None):
+    """
+      Adds several items in one batch. Each entry is a (date, project, hours,
+      description) tuple. Every entry is checked before anything is written,
+      then the deletes needed for merging and the new items are each sent
+      concurrently. before_send, if it's given, is called once everything has
+      been checked, just before the first request goes out.
+
+      The result for each entry is True if it was added, or the hours already
+      on that day if --fill left nothing to add.
+    """
+    day_hours = {}
+    planned = []
     to_delete = set()
-    total_hours = hours
-    if merge:
-      for i in self.items:
-        if all([i.date == date, i.project.lower() == project.lower(), i.description == description]):
-          to_delete.add(i)
-          total_hours += i.hours
-
-    if total_hours > 99.0:
-      click.echo(f'Merging this item with other items is too many hours: {total_hours}', err=True)
-      click.echo('You can enter it as a separate item with the --no-merge flag', err=True)
-      sys.exit(Error.INVALID_ARGUMENT)
-
-    for i in to_delete:
-      self.delete_item(i.id)
+    results = []
+    for d, project, hours, description in entries:
+      p, hours, description = validate_item(project, hours, description)
+
+      if d not in day_hours:
+        day_hours[d] = sum(i.hours for i in self.items if i.date == d)
+
+      if fill:
+        current_hours = day_hours[d]
+        hours = min(hours, Decimal('8.0') - current_hours)
+        if hours < 0.01:
+          results.append(current_hours)
+          continue
+
+      day_hours[d] += hours
+      results.append(True)
+
+      item = None
+      if merge:
+        # Fold this into an item already planned in this batch, if there is one
+        item = next((x for x in planned if x[0] == d and x[1] == p and x[3] == description), None)
+
+      if item:
+        item[2] += hours
+      else:
+        item = [d, p, hours, description]
+        planned.append(item)
+
+        if merge:
+          for i in self.items:
+            if all([i.date == d, i.project.lower() == p.name.lower(), i.description == description]):
+              to_delete.add(i)
+              item[2] += i.hours
+
+      if item[2] > 99.0:
+        click.echo(f'Merging this item with other items is too many hours: {item[2]}', err=True)
+        click.echo('You can enter it as a separate item with the --no-merge flag', err=True)
+        sys.exit(Error.INVALID_ARGUMENT)
+
+    known = {i.id for i in self.items}
+    if before_send:
+      before_send()
+
+    for _ in req.run_parallel(self.delete_item, [(i.id,) for i in to_delete]):
+      pass
+
+    # Identical items are posted one after another, so that if one fails,
+    # the new items like it can be counted to tell whether it went through
+    alike = {}
+    for d, p, hours, description in planned:
+      alike.setdefault((d, p.id, description, hours), []).append((d, p, hours, description))
+
+    for _ in req.run_parallel(self._post_alike, [(items, known) for items in alike.values()]):
+      pass
+
+    # The new items' ids are only on the page, so the items are loaded again
+    # the next time they're needed
+    self._items = None
+    self._hours = None
+    self._digest = None
+    return results
+
+  def _post_alike(self, items, known):
+    for n, item in enumerate(items):
+      self._post_item(*item, known, earlier=n)
+
+  def _post_item(self, date, project, hours, description, known, earlier=0):
+    """
+      Posts a new item. known is the ids of the items from before the batch,
+      and earlier is how many identical items were posted before this one.
+    """
+    def applied():
+      # Only items which weren't there before are counted, so an identical
+      # item that was already on the timesheet doesn't look like this one
+      new = [
+        i for i in self._current_items()
+        if i.id not in known and (i.date, i.project, i.description, i.hours) == (date, project.name, description, hours)
+      ]
+      return len(new) > earlier
 
     req.post(f'/timesheet/{self.id}/', data={
       'log_date': date.strftime('%m/%d/%Y'),
-      'project': p.id,
-      'hours_worked': total_hours,
+      'project': project.id,
+      'hours_worked': hours,
       'description': description,
       'ticket': '',
       'billing_type': 'M',
       'parent_ticket': '',
       'undefined': '',
-    }, xhr=True)
-
-    return True
+    }, xhr=True, verify=applied)
 
   def delete_item(self, item_id):
     req.post(f'/timesheet/{self.id}/', data={
       'id': item_id,
       'action': 'delete',
-    }, xhr=True)
+    }, xhr=True, verify=lambda: all(i.id != item_id for i in self._current_items()))
+
+    # Deletes can run in parallel, so the item is dropped from whatever set
+    # is loaded by then, rather than loading the page again
+    with _items_lock:
+      if self._items is not None:
+        self._items = {i for i in self._items if i.id != item_id}
+
+      self._hours = None
+      self._digest = None
+
+  def _current_items(self):
+    # What's on the website right now, for checking whether a failed post
+    # went through. Nothing is saved, since the page is about to change.
+    return _parse_timesheet(*_body(req.get(f'/timesheet/{self.id}/')))[0]
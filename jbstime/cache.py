@@ -0,0 +1,53 @@
+import json
+import os
+import threading
+
+from . import config, trace
+
+
+# Held while saving, and by anything that loads, changes and saves a file, as
+# timesheets can be loaded on several threads at once
+lock = threading.RLock()
+
+# The version of what's saved from the website's pages. It changes whenever
+# that does, so files saved by an older version are ignored, and the pages
+# parsed again, rather than misread.
+FORMAT = 1
+
+
+def cache_path(name):
+  return config.HOME() / f'{name}.json'
+
+
+def load(name, default=None, format=None):
+  """
+    Loads a saved file, or returns default if there isn't one. If format is
+    given, a file saved in any other format is treated as missing too.
+  """
+  try:
+    with trace.span(f'load {name}.json'), cache_path(name).open() as f:
+      data = json.load(f)
+  except (FileNotFoundError, ValueError):
+    return default
+
+  if format is not None and (not isinstance(data, dict) or data.get('format') != format):
+    return default
+
+  return data
+
+
+def save(name, data):
+  # Like the holiday file, nothing is cached unless the user has a .jbstime
+  # directory
+  if not config.HOME().exists():
+    return
+
+  # Each writer has its own temporary file, so a background refresh in
+  # another process can't replace one that's half written
+  path = cache_path(name)
+  tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+  with lock:
+    with trace.span(f'save {name}.json'), tmp.open('w') as f:
+      json.dump(data, f, separators=(',', ':'))
+
+    tmp.replace(path)
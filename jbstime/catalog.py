@@ -0,0 +1,149 @@
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+from . import cache
+
+
+# The catalog is read during shell completion, so this module (and anything it
+# imports) must stay cheap to load and must never touch the network.
+
+# How long the project list can be used before it is loaded from a timesheet
+PROJECT_MAX_AGE = timedelta(days=1)
+
+
+def load():
+  return cache.load('catalog', {})
+
+
+def update(projects=None, weeks=None):
+  with cache.lock:
+    catalog = load()
+
+    if projects is not None:
+      catalog['projects'] = [[p.id, p.name, p.favorite] for p in projects.values()]
+      catalog['projects_fetched'] = datetime.now().isoformat()
+      catalog['trigrams'] = ProjectIndex([p.name for p in projects.values()]).trigrams
+
+    if weeks is not None:
+      catalog['weeks'] = {d.isoformat(): id for d, id in weeks.items()}
+
+    cache.save('catalog', catalog)
+
+
+def load_projects(max_age=PROJECT_MAX_AGE):
+  """
+    Returns the cached projects as (id, name, favorite) lists along with their
+    index, or None if there are no cached projects or they have expired.
+  """
+  catalog = load()
+  if 'projects' not in catalog:
+    return None
+
+  fetched = datetime.fromisoformat(catalog['projects_fetched'])
+  if max_age is not None and datetime.now() - fetched > max_age:
+    return None
+
+  projects = catalog['projects']
+  return projects, ProjectIndex([p[1] for p in projects], catalog.get('trigrams'))
+
+
+def project_names():
+  # Favorites first, since those are the ones most likely to be wanted
+  projects = sorted(load().get('projects', []), key=lambda p: (not p[2], p[1].lower()))
+  return [name for id, name, favorite in projects]
+
+
+def week_id(week):
+  return load().get('weeks', {}).get(week.isoformat())
+
+
+def week_dates():
+  return sorted((date.fromisoformat(d) for d in load().get('weeks', {})), reverse=True)
+
+
+def complete_project(ctx, param, incomplete):
+  incomplete = incomplete.lower()
+  return [name for name in project_names() if name.lower().startswith(incomplete)]
+
+
+def complete_date(ctx, param, incomplete):
+  dates = [f'{d.month}/{d.day}/{d.year}' for d in week_dates()]
+  return [d for d in ['current'] + dates if d.startswith(incomplete)]
+
+
+def trigrams(s):
+  s = f' {s} '
+  return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class ProjectIndex:
+  """
+    A prefix and trigram index over project names. Lookups are
+    case-insensitive and return positions in the list of names the index was
+    built from.
+  """
+
+  # How much of their combined trigrams a query and a name must share for the
+  # name to be suggested
+  SIMILARITY = 0.4
+
+  def __init__(self, names, trigram_map=None):
+    self.names = [n.lower() for n in names]
+    self.sorted_names = sorted((n, i) for i, n in enumerate(self.names))
+
+    if trigram_map is None:
+      trigram_map = {}
+      for i, name in enumerate(self.names):
+        for t in trigrams(name):
+          trigram_map.setdefault(t, []).append(i)
+
+    self.trigrams = trigram_map
+
+  def prefix(self, query):
+    query = query.lower()
+    start = bisect_left(self.sorted_names, (query, -1))
+
+    result = []
+    for name, i in self.sorted_names[start:]:
+      if not name.startswith(query):
+        break
+
+      result.append(i)
+
+    return sorted(result)
+
+  def contains(self, query):
+    query = query.lower()
+
+    # Anything containing the query contains all of its trigrams (ignoring the
+    # padded ones at the ends), so only those candidates need to be checked
+    inner = [t for t in trigrams(query) if ' ' not in (t[0], t[2])]
+    if inner:
+      candidates = set.intersection(*(set(self.trigrams.get(t, [])) for t in inner))
+    else:
+      candidates = range(len(self.names))
+
+    return sorted(i for i in candidates if query in self.names[i])
+
+  def similar(self, query):
+    query_trigrams = trigrams(query.lower())
+
+    scores = {}
+    for t in query_trigrams:
+      for i in self.trigrams.get(t, []):
+        scores[i] = scores.get(i, 0) + 1
+
+    for i, shared in scores.items():
+      scores[i] = shared / (len(query_trigrams) + len(trigrams(self.names[i])) - shared)
+
+    return sorted((i for i, score in scores.items() if score >= self.SIMILARITY), key=lambda i: -scores[i])
+
+  def match(self, query):
+    """
+      Finds the projects a user probably meant. An exact match wins, then a
+      prefix, then a substring. This can return several positions, in which
+      case the query is ambiguous.
+    """
+    query = query.lower().strip()
+    exact = [i for i in self.prefix(query) if self.names[i] == query]
+    return exact or self.prefix(query) or self.contains(query)
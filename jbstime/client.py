@@ -1,40 +1,71 @@
+import contextlib
 from datetime import date, datetime, timedelta
-from decimal import Decimal
+import io
+import json
+import os
+import shlex
+import subprocess
 import sys
 
 import click
 
-from . import api, config as config_
+from . import api, catalog, config as config_, journal, ledger, req, search as search_, stats as stats_, trace
 from .api import Timesheet
-from .dates import date_fmt, date_fmt_pad_day, date_from_user_date, find_sunday
+from .dates import date_fmt, date_fmt_pad_day, date_from_user_date, find_sunday, time_ago
 from .error import Error
 
 
+# Commands which connect to the website, so changes queued with --offline
+# are sent before them. The rest, like search and stats, only read local files.
+ONLINE_COMMANDS = {
+  'add', 'addall', 'batch', 'copy', 'create', 'delete', 'holidays', 'projects', 'pto', 'submit', 'sync',
+  'timesheet', 'timesheets',
+}
+
+
 def _exec():  # pragma: no cover
   try:
     return cli()
   except Exception as e:
     click.echo(f'Unexpected error: {e}', err=True)
-    sys.exit(Error.UNEXPECTED_ERROR)
+    sys.exit(Error.UNEXPECTED_EXCEPTION)
 
 
 def check_pto(timesheet, full_report=False):
-  pto_info = api.pto()
-  added_hours = Decimal('0')
-  removed_hours = Decimal('0')
-  for i in timesheet.items:
-    if i.project.startswith('JBS - PTO'):
-      removed_hours += i.hours
-    else:
-      added_hours += i.hours
+  report_pto(api.pto(), timesheet.items, timesheet.locked, full_report=full_report)
+
+
+def confirm(text):
+  # A batch's input is its script, so it answers confirmations itself
+  answer = click.get_current_context().obj.get('batch_answer')
+  if answer is None:
+    return click.confirm(text)
+
+  click.echo(f'{text} [y/N]: {"y" if answer else "n"}')
+  return answer
 
-  new_pto = pto_info.balance + (added_hours / pto_info.accrual * 8) - removed_hours
 
-  def pl(x):
-    if 0.999 < x < 1.001:
-      return '1 hour'
+def check_latest_pto(*timesheets):
+  """
+    After a change to any of timesheets, reloads the latest timesheet and
+    reports PTO if it was one of them. A batch does this once at the end of a
+    run of changes rather than after each one.
+  """
+  latest = Timesheet.latest()
+  if latest not in timesheets:
+    return
+
+  pending = click.get_current_context().obj.get('pto_pending')
+  if pending is not None:
+    pending.add(latest)
+    return
 
-    return f'{x} hours'
+  latest.reload()
+  check_pto(latest)
+
+
+def report_pto(pto_info, items, locked, full_report=False):
+  new_pto = ledger.projected_balance(pto_info, items)
 
   if full_report:
     click.echo(f'You have {pl(pto_info.balance)} remaining')
@@ -42,7 +73,7 @@ def check_pto(timesheet, full_report=False):
     click.echo(f'You earn a day for every {pl(pto_info.accrual)}')
     click.echo(f'You are capped at {pl(pto_info.cap)}')
 
-  if pto_info.cap <= new_pto and not timesheet.locked:
+  if pto_info.cap <= new_pto and not locked:
     click.echo('Warning: current additional hours exceeds your PTO cap')
 
     current_str = f'Current timesheet puts you at {new_pto:.2f}.'
@@ -52,11 +83,72 @@ def check_pto(timesheet, full_report=False):
     click.echo(current_str)
 
 
+def prefetch(*dates):
+  # Start loading the pages a command will probably need, all at once
+  for d in dates:
+    api.prefetch_for(date_from_user_date(d) if d else None)
+
+
+def pl(x):
+  if 0.999 < x < 1.001:
+    return '1 hour'
+
+  return f'{x} hours'
+
+
+def spawn_refresh():
+  # The refresh runs in its own detached process so this one can exit
+  # without waiting for it
+  info = click.get_current_context().obj
+  env = dict(os.environ)
+  if info.get('cmd_username'):
+    env['JBS_TIMETRACK_USER'] = info['cmd_username']
+
+  if info.get('cmd_password'):
+    env['JBS_TIMETRACK_PASS'] = info['cmd_password']
+
+  subprocess.Popen(
+    [sys.executable, '-c', 'from jbstime.client import cli; cli()', 'refresh'],
+    env=env,
+    stdin=subprocess.DEVNULL,
+    stdout=subprocess.DEVNULL,
+    stderr=subprocess.DEVNULL,
+    start_new_session=True,
+  )
+
+
+def serving_stale(fetched):
+  click.echo(f'(Showing data from {time_ago(fetched)}, refreshing in the background)', err=True)
+  spawn_refresh()
+
+
+def load_stale():
+  """
+    With --stale, loads the timesheet index saved last time and starts a
+    refresh for next time. Returns whether stale data is being used.
+  """
+  if not click.get_current_context().obj.get('stale'):
+    return False
+
+  fetched = api.load_stale()
+  if fetched is None:
+    return False
+
+  serving_stale(fetched)
+  return True
+
+
 @click.group()
 @click.option('-u', '--user', 'username')
 @click.option('-p', '--pass', 'password')
+@click.option('--stale', is_flag=True, envvar='JBSTIME_STALE', help='Show saved data for read-only commands at once')
+@click.option('--offline', is_flag=True, envvar='JBSTIME_OFFLINE', help='Queue adds and deletes to send later')
+@click.option('--record', type=click.Path(file_okay=False), envvar='JBSTIME_RECORD',
+              help='Save the requests and responses to a directory')
+@click.option('--replay', type=click.Path(exists=True, file_okay=False), envvar='JBSTIME_REPLAY',
+              help='Answer requests from a directory saved by --record')
 @click.pass_context
-def cli(ctx, username, password):
+def cli(ctx, username, password, stale, offline, record, replay):
   """
     Commands for managing JBS timesheets.
 
@@ -69,17 +161,81 @@ def cli(ctx, username, password):
     creating JBS_TIMESHEET_USER and JBS_TIMESHEET_PASS environmental
     variables, or by using the --user and --pass options. If all else fails,
     you will be prompted to enter them on the command line.
+
+    Shell completion of project names and timesheet dates can be enabled with
+    `eval "$(_JBSTIME_COMPLETE=bash_source jbstime)"` (or zsh_source or
+    fish_source). Completions come from a catalog kept in the .jbstime
+    directory, which is refreshed whenever timesheets are loaded.
+
+    Setting a JBSTIME_TRACE environmental variable to a file name writes a
+    Chrome trace of each command's requests and parsing to that file, and
+    setting JBSTIME_PROFILE prints a summary of where the time went.
+    Setting JBSTIME_STATS keeps a history of how long each command took, which
+    `stats` summarizes.
+    Setting JBSTIME_HTTP2 talks to the website over HTTP/2, if jbstime was
+    installed with the http2 extra.
+
+    With --stale (or a JBSTIME_STALE environmental variable), the holidays,
+    timesheets and pto commands show the data saved in the .jbstime directory
+    the last time it was loaded, then refresh it in the background for next
+    time.
+
+    With --offline (or a JBSTIME_OFFLINE environmental variable), add and
+    delete don't connect to the website. Instead they are queued in the
+    .jbstime directory and sent by `flush`, or before the next command run
+    without --offline that connects to the website.
+
+    --record DIR saves every request and response to DIR, with usernames,
+    passwords and CSRF tokens scrubbed out. --replay DIR answers requests from
+    those files instead of the website, so a run can be repeated exactly, and
+    timed, without a connection.
   """
 
   ctx.ensure_object(dict)
   ctx.obj['cmd_username'] = username
   ctx.obj['cmd_password'] = password
   ctx.obj['logged_in'] = False
+  ctx.obj['stale'] = stale
+  ctx.obj['offline'] = offline
+
+  if record:
+    req.record(record)
+
+  if replay:
+    req.replay(replay)
+
+  # The recorder is registered first so it finishes last, after the command's span
+  if os.environ.get('JBSTIME_STATS') and ctx.invoked_subcommand not in (None, 'stats'):
+    ctx.call_on_close(stats_.Recorder(ctx.invoked_subcommand).finish)
+
+  if ctx.invoked_subcommand:
+    ctx.with_resource(trace.span(f'command {ctx.invoked_subcommand}'))
+
+  if not offline and not stale and ctx.invoked_subcommand in ONLINE_COMMANDS:
+    try:
+      flush_journal()
+    except (Exception, SystemExit) as e:
+      # The command that was asked for still runs
+      reason = f': {e}' if isinstance(e, Exception) else ''
+      click.echo(f'Couldn\'t send the queued changes{reason}. Run `flush` to try again.', err=True)
+
+
+def flush_journal(resend=False):
+  count = len(journal.pending())
+  if count:
+    plural = 's' if count > 1 else ''
+    click.echo(f'Sending {count} queued change{plural}', err=True)
+    applied = journal.flush(resend=resend)
+    if applied:
+      plural = 's' if applied > 1 else ''
+      click.echo(f'Sent {applied} queued change{plural}', err=True)
+
+  return count
 
 
 @cli.command()
-@click.argument('date')
-@click.argument('project')
+@click.argument('date', shell_complete=catalog.complete_date)
+@click.argument('project', shell_complete=catalog.complete_project)
 @click.argument('hours')
 @click.argument('description')
 @click.option('--merge/--no-merge', default=True)
@@ -91,14 +247,22 @@ def add(date, project, hours, description, merge):
     timesheet. --merge (the default) will delete existing items with the same
     project and description and combine those hours into a single item.
     --no-merge disables this feature.
+
+    PROJECT can be any part of a project name, as long as it only matches one
+    project.
   """
 
+  if click.get_current_context().obj.get('offline'):
+    date = date_from_user_date(date)
+    p = journal.queue_add(date, project, hours, description, merge=merge)
+    click.echo(f'Queued {p.name} on {date_fmt(date)}')
+    return
+
+  prefetch(date)
   timesheet = Timesheet.from_user_date(date)
   date = date_from_user_date(date)
   timesheet.add_item(date, project, hours, description, fill=False, merge=merge)
-  if Timesheet.latest() == timesheet:
-    timesheet.reload()
-    check_pto(timesheet)
+  check_latest_pto(timesheet)
 
 
 @cli.command()
@@ -122,13 +286,15 @@ def config():
 
 
 @cli.command()
-@click.argument('date')
-@click.argument('project')
+@click.argument('date', shell_complete=catalog.complete_date)
+@click.argument('project', shell_complete=catalog.complete_project)
 @click.argument('hours')
 @click.argument('description')
 @click.option('--fill/--no-fill', default=True)
 @click.option('--merge/--no-merge', default=True)
-def addall(date, project, hours, description, fill, merge):
+@click.option('--to', 'to_date', metavar='DATE', shell_complete=catalog.complete_date,
+              help='Fill every timesheet from DATE up to this one')
+def addall(date, project, hours, description, fill, merge, to_date):
   """
     Adds an entry to every workday on a timesheet. Useful for quickly filling
     out duplicate entries.
@@ -139,13 +305,24 @@ def addall(date, project, hours, description, fill, merge):
     same project and description and combine those hours into a single item.
     --no-fill and --no-merge disables these feature.
 
+    To fill several weeks at once, give the last one with --to, as in `addall
+    6/1 PROJECT HOURS DESCRIPTION --to 7/31`. DATE is then the first timesheet
+    of the range. Any timesheets in the range which don't exist yet are
+    created, and submitted timesheets are skipped.
+
     In the event that any of the days overlap with JBS holidays, you will be
     prompted with an option to fill those out with paid holiday time instead.
   """
-  timesheet = Timesheet.from_user_date(date)
+  api.validate_item(project, hours, description)
+
+  if to_date:
+    timesheets = timesheet_range(date, to_date)
+  else:
+    prefetch(date)
+    timesheets = [Timesheet.from_user_date(date)]
 
   set_holidays = False
-  dates = [timesheet.date - timedelta(days=x) for x in range(2, 7)]
+  dates = [ts.date - timedelta(days=x) for ts in timesheets for x in range(2, 7)]
   holidays = api.list_holidays()
   conflicts = sorted((d, h) for d, h in holidays.items() if d in dates)
   if conflicts:
@@ -166,16 +343,27 @@ def addall(date, project, hours, description, fill, merge):
       cstr += f'{date_fmt(d)} {verb} {h}'
 
     click.echo(cstr)
-    set_holidays = click.confirm('Set holidays to time off?')
-
-  # Add the same info to Monday through Friday
-  results = []
-  with click.progressbar(dates) as item_dates:
-    for d in item_dates:
+    api.prefetch_for_write(*timesheets)
+    set_holidays = confirm('Set holidays to time off?')
+
+  # Add the same info to Monday through Friday, as one batch for each
+  # timesheet. The timesheets are filled in parallel.
+  def fill_week(timesheet):
+    days = [timesheet.date - timedelta(days=x) for x in range(2, 7)]
+    entries = []
+    for d in days:
       if set_holidays and d in holidays:
-        results.append([d, timesheet.add_item(d, 'JBS - Paid Holiday', 8, holidays[d], fill=fill, merge=merge)])
+        entries.append((d, 'JBS - Paid Holiday', 8, holidays[d]))
       else:
-        results.append([d, timesheet.add_item(d, project, hours, description, fill=fill, merge=merge)])
+        entries.append((d, project, hours, description))
+
+    return list(zip(days, timesheet.add_items(entries, fill=fill, merge=merge)))
+
+  results = []
+  with click.progressbar(length=len(dates)) as bar:
+    for week in req.run_parallel(fill_week, [(ts,) for ts in timesheets]):
+      results += week
+      bar.update(len(week))
 
   count_errors = sum(r is not True for d, r in results)
   if count_errors == 1:
@@ -190,14 +378,96 @@ def addall(date, project, hours, description, fill, merge):
       if r is not True:
         click.echo(f'  {date_fmt_pad_day(d)} - {r:>6.2f} hours')
 
-  if Timesheet.latest() == timesheet:
-    timesheet.reload()
-    check_pto(timesheet)
+  check_latest_pto(*timesheets)
+
+
+def timesheet_range(from_date, to_date):
+  """
+    Returns the unsubmitted timesheets from one date to another, creating any
+    that are missing.
+  """
+  start = find_sunday(date_from_user_date(from_date))
+  end = find_sunday(date_from_user_date(to_date))
+  if end < start:
+    click.echo(f'The range ends before it starts: {date_fmt(start)} to {date_fmt(end)}', err=True)
+    sys.exit(Error.INVALID_ARGUMENT)
+
+  weeks = [start + timedelta(weeks=x) for x in range((end - start).days // 7 + 1)]
+  # The weeks are taken down once, since each create clears the loaded
+  # timesheets while the others may still need to know what was there
+  known = set(Timesheet.list())
+  missing = [(d, known) for d in weeks if d not in known]
+  if missing:
+    for _ in req.run_parallel(Timesheet.create, missing):
+      pass
+
+    plural = 's' if len(missing) > 1 else ''
+    click.echo(f'Created {len(missing)} timesheet{plural}')
+
+  timesheets = []
+  for d in weeks:
+    timesheet = Timesheet.list()[d]
+    if timesheet.locked:
+      click.echo(f'Skipping the timesheet for {date_fmt(d)}, which has already been submitted')
+    else:
+      timesheets.append(timesheet)
+
+  return timesheets
 
 
 @cli.command()
-@click.argument('date')
-@click.argument('project')
+@click.argument('from_date', shell_complete=catalog.complete_date)
+@click.argument('to_date', default='current', shell_complete=catalog.complete_date)
+@click.option('--fill/--no-fill', default=False)
+@click.option('--merge/--no-merge', default=True)
+def copy(from_date, to_date, fill, merge):
+  """
+    Copies every entry on one timesheet to another.
+
+    FROM_DATE is the date of the timesheet to copy, and TO_DATE the date of
+    the timesheet to copy to. If TO_DATE is not specified, uses the current
+    date. Entries keep their day of the week. The timesheet is created if it
+    doesn't exist yet.
+
+    --merge (the default) will delete existing items with the same project and
+    description and combine those hours into a single item. --fill will
+    ensure if time is already recorded that additional time does not extend
+    beyond an 8 hour day.
+  """
+  prefetch(from_date, to_date)
+  source = Timesheet.from_user_date(from_date)
+  target_date = find_sunday(date_from_user_date(to_date))
+  if target_date == source.date:
+    click.echo('Can\'t copy a timesheet to itself', err=True)
+    sys.exit(Error.INVALID_ARGUMENT)
+
+  if not source.items:
+    click.echo(f'No hours added to the timesheet for {date_fmt(source.date)}')
+    sys.exit()
+
+  if target_date not in Timesheet.list():
+    Timesheet.create(target_date)
+    click.echo(f'Created timesheet for {date_fmt(target_date)}')
+
+  target = Timesheet.list()[target_date]
+  if target.locked:
+    click.echo(f'The timesheet for {date_fmt(target.date)} has already been submitted', err=True)
+    sys.exit(Error.TIMESHEET_SUBMITTED)
+
+  shift = target.date - source.date
+  entries = [(i.date + shift, i.project, i.hours, i.description) for i in sorted(source.items)]
+  results = target.add_items(entries, fill=fill, merge=merge)
+
+  count = sum(r is True for r in results)
+  plural = 's' if count != 1 else ''
+  click.echo(f'Copied {count} item{plural} to the timesheet for {date_fmt(target.date)}')
+
+  check_latest_pto(target)
+
+
+@cli.command()
+@click.argument('date', shell_complete=catalog.complete_date)
+@click.argument('project', shell_complete=catalog.complete_project)
 @click.argument('description', required=False)
 @click.option('--all', is_flag=True, help='Apply to all days on the timesheet')
 def delete(date, project, description, all):
@@ -210,24 +480,24 @@ def delete(date, project, description, all):
     in which case it will match all projects.
 
     You will be prompted with the number of affected entries and given a chance
-    to confirm the deletion.
+    to confirm the deletion. With --offline, the matching entries aren't
+    known until the deletion is sent, so you will only be asked to confirm.
   """
 
-  timesheet = Timesheet.from_user_date(date)
   item_date = None if all else date_from_user_date(date)
   project = project.lower()
   description = description.lower() if description else None
 
-  to_delete = set()
-  for i in timesheet.items:
-    if item_date and item_date != i.date:
-      continue
+  if click.get_current_context().obj.get('offline'):
+    if confirm('Queue deletion of the matching items?'):
+      journal.queue_delete(find_sunday(date_from_user_date(date)), item_date, project, description)
 
-    if project == 'all' or project == i.project.lower():
-      if description and description != i.description.lower():
-        continue
+    return
+
+  prefetch(date)
+  timesheet = Timesheet.from_user_date(date)
 
-      to_delete.add(i)
+  to_delete = set(i for i in timesheet.items if api.item_matches(i, item_date, project, description))
 
   if not len(to_delete):
     click.echo('No matching items')
@@ -236,7 +506,8 @@ def delete(date, project, description, all):
   count = len(to_delete)
   plural = 's' if count > 1 else ''
   click.echo(f'{count} item{plural} to delete')
-  if not click.confirm('Are you sure?'):
+  api.prefetch_for_write(timesheet)
+  if not confirm('Are you sure?'):
     return
 
   with click.progressbar(to_delete) as items:
@@ -260,14 +531,25 @@ def create(date):
 
 
 @cli.command()
-@click.argument('date', default='current')
-def submit(date):
+@click.argument('date', default='current', shell_complete=catalog.complete_date)
+@click.option('--all-unsubmitted', is_flag=True, help='Submit every unsubmitted timesheet for a finished week')
+@click.option('--range', 'date_range', nargs=2, metavar='FROM TO', help='Submit the unsubmitted timesheets in a range')
+def submit(date, all_unsubmitted, date_range):
   """
     Submits a timesheet.
 
     This will warn you if there are fewer than 40 hours recorded. Timesheets
     cannot be edited after they've been submitted.
+
+    --all-unsubmitted submits every unsubmitted timesheet for a week which
+    has ended, and --range submits the unsubmitted timesheets from one date
+    to another. Either one shows the timesheets to be submitted, and any with
+    fewer than 40 hours, and asks once for confirmation.
   """
+  if all_unsubmitted or date_range:
+    submit_many(date_range)
+    return
+
   timesheet = Timesheet.from_user_date(date)
   if timesheet.locked:
     click.echo(f'The timesheet for {date_fmt(timesheet.date)} has already been submitted', err=True)
@@ -281,19 +563,75 @@ def submit(date):
       verb = 'is' if 0.09 < timesheet.hours < 1.01 else 'are'
       msg = f'There {verb} only {timesheet.hours} {plural} logged. Submit anyway?'
 
-    if not click.confirm(msg):
+    api.prefetch_for_write(timesheet, load_items=False)
+    if not confirm(msg):
       sys.exit()
 
   timesheet.submit()
   click.echo(f'Submitted timesheet for {date_fmt(timesheet.date)}')
 
 
+def submit_many(date_range):
+  if date_range:
+    start, end = (find_sunday(date_from_user_date(d)) for d in date_range)
+  else:
+    # Weeks which haven't ended yet are left out
+    start, end = date.min, find_sunday(datetime.now().date() - timedelta(days=7))
+
+  timesheets = sorted(
+    (ts for ts in Timesheet.list().values() if start <= ts.date <= end and not ts.locked),
+    key=lambda ts: ts.date,
+  )
+  if not timesheets:
+    click.echo('No unsubmitted timesheets')
+    sys.exit()
+
+  low = 0
+  plural = 's' if len(timesheets) > 1 else ''
+  click.echo(f'{len(timesheets)} timesheet{plural} to submit:')
+  for ts in timesheets:
+    note = ''
+    if ts.hours < 0.01:
+      note = '  (no time logged)'
+    elif ts.hours < 39.9:
+      note = '  (fewer than 40 hours)'
+
+    low += bool(note)
+    click.echo(f'  {date_fmt_pad_day(ts.date)}  {ts.hours:>6.2f}{note}')
+
+  if low:
+    plural = 's have' if low > 1 else ' has'
+    click.echo(f'{low} timesheet{plural} fewer than 40 hours logged.')
+
+  api.prefetch_for_write(*timesheets, load_items=False)
+  if not confirm('Submit them?'):
+    sys.exit()
+
+  def submit_one(timesheet):
+    try:
+      timesheet.submit()
+    except Exception as e:
+      return e
+
+  failed = False
+  for ts, error in zip(timesheets, req.run_parallel(submit_one, [(ts,) for ts in timesheets])):
+    if error:
+      failed = True
+      click.echo(f'Failed to submit timesheet for {date_fmt(ts.date)}: {error}', err=True)
+    else:
+      click.echo(f'Submitted timesheet for {date_fmt(ts.date)}')
+
+  if failed:
+    sys.exit(Error.UNEXPECTED_EXCEPTION)
+
+
 @cli.command()
 @click.option('--limit', default='5', show_default=True, help='Number to show, or "all"')
 def timesheets(limit):
   """
     Lists existing timesheets, most recent first.
   """
+  load_stale()
 
   dates = Timesheet.list()
   if limit == 'all':
@@ -324,17 +662,12 @@ def projects(search, all):
     Lists projects.
 
     If SEARCH is specified, this will only list projects which include the
-    search string (case-insensitive). By default, this only lists projects
-    you have favorited.
+    search string (case-insensitive), or projects with similar names if none
+    do. By default, this only lists projects you have favorited.
   """
 
-  if search:
-    search = search.lower()
-
-  for project in api.list_projects().values():
-    if search and search not in project.name.lower():
-      continue
-
+  projects = api.search_projects(search) if search else api.list_projects().values()
+  for project in projects:
     if all or project.favorite:
       click.echo(project.name)
 
@@ -355,6 +688,7 @@ def holidays(all):
   else:
     start_date = (datetime.now() - timedelta(weeks=2)).date()
 
+  load_stale()
   holidays = api.list_holidays()
   for d in sorted(holidays):
     if d < start_date:
@@ -364,21 +698,253 @@ def holidays(all):
 
 
 @cli.command()
-def pto():
+@click.option('--forecast', type=click.IntRange(min=1), metavar='WEEKS', help='Project your balance WEEKS ahead')
+@click.option('--hours', default=40, show_default=True, help='Hours worked per week in the forecast')
+@click.option('--refresh', is_flag=True, help='Ignore the local PTO ledger')
+def pto(forecast, hours, refresh):
   """
     Lists your PTO information.
+
+    If there is a .jbstime directory in the user's home directory, the latest
+    PTO balance and timesheet are kept there and used when they are recent,
+    rather than loading them from the website. --refresh ignores this local
+    ledger. --forecast projects your balance against your cap over the given
+    number of weeks, assuming --hours hours worked each week.
+  """
+  stale = click.get_current_context().obj.get('stale')
+  entry = None
+  if not refresh:
+    entry = ledger.load(max_age=None if stale else ledger.MAX_AGE)
+    if entry and stale:
+      serving_stale(api.cached_pto().fetched)
+
+  if entry is None:
+    timesheet = Timesheet.latest()
+    entry = ledger.Ledger(api.pto(), timesheet.date, timesheet.items, timesheet.locked)
+
+  report_pto(entry.pto, entry.items, entry.locked, full_report=True)
+
+  if forecast:
+    click.echo()
+    click.echo(f'Forecast at {pl(hours)} a week')
+    for week in ledger.forecast(entry, forecast, weekly_hours=hours):
+      capped = '  (capped)' if week.capped else ''
+      click.echo(f'  {date_fmt_pad_day(week.date)}  {week.balance:>7.2f}{capped}')
+
+
+@cli.command()
+@click.option('--resend', is_flag=True, help='Also send changes an interrupted flush may already have sent')
+@click.option('--forget', is_flag=True, help='Drop changes an interrupted flush may already have sent')
+def flush(resend, forget):
+  """
+    Sends changes queued with --offline.
+
+    If a flush is interrupted while sending a change, there's no telling
+    whether it went through, so it's kept along with the rest of the changes
+    for its timesheet. Once you've checked the timesheet, --resend sends them
+    anyway and --forget drops the uncertain ones.
+  """
+  if forget:
+    count = journal.forget()
+    plural = 's' if count != 1 else ''
+    click.echo(f'Dropped {count} change{plural}')
+    return
+
+  if not flush_journal(resend=resend):
+    click.echo('Nothing is queued')
+
+
+@cli.command()
+@click.option('--all', is_flag=True, help='Reload submitted timesheets which have already been synced')
+def sync(all):
+  """
+    Saves the items on all your timesheets to the .jbstime directory.
+
+    This is what `search` looks through. Timesheets are also saved whenever
+    they're loaded by other commands. Submitted timesheets can't change, so
+    they are only loaded once unless --all is specified.
+  """
+  config_.HOME().mkdir(parents=True, exist_ok=True)
+
+  known = api.cached_weeks()
+  timesheets = [ts for ts in Timesheet.list().values() if all or not ts.locked or ts.date not in known]
+  with click.progressbar(length=len(timesheets)) as bar:
+    for _ in api.sync(timesheets):
+      bar.update(1)
+
+  plural = 's' if len(timesheets) != 1 else ''
+  click.echo(f'Synced {len(timesheets)} timesheet{plural}')
+
+
+@cli.command()
+@click.argument('query')
+@click.option('--project', help='Only match projects whose names include this')
+@click.option('--from', 'from_date', metavar='DATE', help='Only match items on or after this date')
+@click.option('--to', 'to_date', metavar='DATE', help='Only match items on or before this date')
+@click.option('--limit', default=20, show_default=True, help='Number to show')
+def search(query, project, from_date, to_date, limit):
+  """
+    Searches the descriptions and projects of your timesheet items.
+
+    This only looks at the timesheets saved in the .jbstime directory, so it
+    doesn't connect to the website. Run `sync` to save all of them. The best
+    matches are shown first, and the most recent among equally good ones.
+  """
+  start = date_from_user_date(from_date) if from_date else None
+  end = date_from_user_date(to_date) if to_date else None
+
+  if not api.cached_weeks():
+    click.echo('No timesheets have been saved yet. Run `sync` first.', err=True)
+    sys.exit(Error.TIMESHEET_MISSING)
+
+  hits = search_.search(query, project=project, start=start, end=end, limit=limit)
+  if not hits:
+    click.echo('No matching items')
+
+  for hit in hits:
+    click.echo(f'{date_fmt_pad_day(hit.date)}  {hit.project:>30}  {hit.hours:>6.2f}  {hit.description}')
+
+
+@cli.command()
+@click.option('--days', default=30, show_default=True, help='How many days back to look')
+def stats(days):
+  """
+    Shows how long commands and requests have taken.
+
+    Nothing is kept unless the JBSTIME_STATS environmental variable is set.
+    Then each command's time, requests, cache hits and the time spent logging
+    in, parsing and writing are added to stats.jsonl in the .jbstime
+    directory. This shows the 50th, 95th and 99th percentile times of each
+    command, and of each kind of request, over the last --days days.
+  """
+  commands, endpoints = stats_.summarize(stats_.load(), days=days)
+  if not commands:
+    click.echo('No stats have been recorded. Set JBSTIME_STATS to record them.')
+    return
+
+  def ms(x):
+    return f'{x:>7.0f} ms'
+
+  click.echo(f'{"Command":<20} {"Runs":>5} {"p50":>10} {"p95":>10} {"p99":>10} {"Requests":>9} {"Cache hits":>11}')
+  for c in commands:
+    click.echo(f'{c.name:<20} {c.runs:>5} {ms(c.p50)} {ms(c.p95)} {ms(c.p99)} {c.requests:>9.1f} {c.hits:>11.1f}')
+
+  click.echo()
+  click.echo(f'{"Request":<30} {"Count":>5} {"p50":>10} {"p95":>10} {"p99":>10}')
+  for e in endpoints:
+    click.echo(f'{e.name:<30} {e.runs:>5} {ms(e.p50)} {ms(e.p95)} {ms(e.p99)}')
+
+
+# Commands which change a timesheet. A run of these in a batch shares one
+# reload and PTO report at the end.
+BATCH_WRITES = {'add', 'addall', 'copy', 'delete'}
+
+
+@cli.command()
+@click.argument('script', type=click.File('r'))
+@click.option('--yes', is_flag=True, help='Answer yes to every confirmation')
+@click.pass_context
+def batch(ctx, script, yes):
+  """
+    Runs a list of commands in one go.
+
+    SCRIPT is a file (or - for standard input) with one command per line,
+    written the way it would be after `jbstime`, like `add 5/18/2020 "Test
+    Project" 8 Testing`. Blank lines and lines starting with # are skipped.
+
+    The commands share one login and whatever pages have already been loaded.
+    A run of add, addall, copy and delete commands reloads the latest
+    timesheet and reports PTO once at the end, instead of after each one.
+
+    Each command's result is written as a line of JSON with its line number,
+    exit code, output and errors. Confirmations are answered no unless --yes
+    is given. If any command fails, the exit code is the first failure's.
+  """
+  lines = [(n, line.strip()) for n, line in enumerate(script, 1) if line.strip() and not line.lstrip().startswith('#')]
+  names = [line.split()[0] for n, line in lines]
+
+  ctx.obj['pto_pending'] = set()
+  ctx.obj['batch_answer'] = yes
+  failure = 0
+  for i, (n, line) in enumerate(lines):
+    flush_pto = names[i + 1] not in BATCH_WRITES if i + 1 < len(lines) else True
+    code, output, errors = _run_batched(ctx, line, flush_pto)
+    failure = failure or code
+
+    click.echo(json.dumps({'line': n, 'command': line, 'exit_code': code, 'output': output, 'errors': errors}))
+
+  sys.exit(failure)
+
+
+def _run_batched(ctx, line, flush_pto):
+  out = io.StringIO()
+  err = io.StringIO()
+
+  def capture(func):
+    try:
+      func()
+    except click.ClickException as e:
+      e.show()
+      return e.exit_code
+    except click.Abort:
+      click.echo('Aborted!', err=True)
+      return 1
+    except SystemExit as e:
+      return e.code or 0
+    except Exception as e:
+      # As when running a single command, but the rest of the batch still runs
+      click.echo(f'Unexpected error: {e}', err=True)
+      return Error.UNEXPECTED_EXCEPTION
+
+    return 0
+
+  def run():
+    try:
+      args = shlex.split(line)
+    except ValueError as e:
+      raise click.UsageError(str(e))
+
+    name, cmd, cmd_args = cli.resolve_command(ctx, args)
+    if name in ('batch', 'config'):
+      raise click.UsageError(f'{name} can\'t be run from a batch')
+
+    with trace.span(f'command {name}'), cmd.make_context(name, cmd_args, parent=ctx) as sub:
+      cmd.invoke(sub)
+
+  def report_pto():
+    pending = ctx.obj['pto_pending']
+    while pending:
+      timesheet = pending.pop()
+      timesheet.reload()
+      check_pto(timesheet)
+
+  with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+    code = capture(run)
+    if flush_pto:
+      pto_code = capture(report_pto)
+      code = code or pto_code
+
+  return int(code), out.getvalue(), err.getvalue()
+
+
+@cli.command(hidden=True)
+def refresh():
+  """
+    Reloads the saved timesheet index and latest timesheet. This is run in the
+    background by --stale.
   """
-  check_pto(Timesheet.latest(), full_report=True)
+  api.refresh()
 
 
 @cli.command()
-@click.argument('date', default='latest')
+@click.argument('date', default='latest', shell_complete=catalog.complete_date)
 def timesheet(date):
   """
     Show the specified timesheet.
 
     If DATE is not specified, this shows the latest timesheet.
   """
+  prefetch(None if date == 'latest' else date)
   if date == 'latest':
     timesheet = Timesheet.latest()
   else:
@@ -3,11 +3,15 @@ import pathlib
 import sys
 
 import click
-import yaml
 
+from . import trace
 from .error import Error
 
 
+# yaml is imported inside the functions that use it so that shell completion
+# doesn't have to load it
+
+
 def HOME():  # Needed for patching during tests
   return pathlib.Path.home() / '.jbstime'
 
@@ -17,6 +21,8 @@ def config_path():
 
 
 def create_config(username, password):
+  import yaml
+
   home = HOME()
   home.mkdir(parents=True, exist_ok=True)
 
@@ -34,6 +40,8 @@ def create_config(username, password):
 
 
 def load_config():
+  import yaml
+
   config = {
     'username': None,
     'password': None,
@@ -43,7 +51,9 @@ def load_config():
   config_file = config_path()
 
   try:
-    yaml_config = yaml.safe_load(config_file.open())
+    with trace.span('load config.yaml'):
+      yaml_config = yaml.safe_load(config_file.open())
+
     config.update(yaml_config)
   except FileNotFoundError:
     pass
@@ -59,14 +69,20 @@ def load_config():
 
 
 def save_holidays(holidays):
+  import yaml
+
   if HOME().exists():
     holiday_file = HOME() / 'holidays.yaml'
-    yaml.dump(holidays, holiday_file.open('w'))
+    with trace.span('save holidays.yaml'):
+      yaml.dump(holidays, holiday_file.open('w'))
 
 
 def load_holidays():
+  import yaml
+
   holiday_file = HOME() / 'holidays.yaml'
   if holiday_file.exists():
-    return yaml.safe_load(holiday_file.open())
+    with trace.span('load holidays.yaml'):
+      return yaml.safe_load(holiday_file.open())
 
   return {}
@@ -2,8 +2,6 @@ from datetime import datetime, timedelta
 import sys
 
 import click
-from dateutil.parser import parse
-from dateutil.parser._parser import ParserError
 
 from .error import Error
 
@@ -17,6 +15,10 @@ def date_fmt_pad_day(d):
 
 
 def date_from_user_date(date):
+  # dateutil is imported here so that shell completion doesn't have to load it
+  from dateutil.parser import parse
+  from dateutil.parser._parser import ParserError
+
   lower_date = date.lower()
   if lower_date in ('today', 'current'):
     return datetime.now().date()
@@ -32,3 +34,19 @@ def date_from_user_date(date):
 
 def find_sunday(d):
   return d + timedelta(days=(6 - d.weekday()))
+
+
+def time_ago(dt):
+  minutes = int((datetime.now() - dt).total_seconds() // 60)
+  if minutes < 1:
+    return 'less than a minute ago'
+
+  if minutes < 120:
+    plural = 's' if minutes > 1 else ''
+    return f'{minutes} minute{plural} ago'
+
+  hours = minutes // 60
+  if hours < 48:
+    return f'{hours} hours ago'
+
+  return f'{hours // 24} days ago'
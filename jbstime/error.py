@@ -9,5 +9,6 @@ class Error(IntEnum):
   TIMESHEET_SUBMITTED = 5
   UNPARSABLE_DATE = 6
   CONFIG_ERROR = 7
+  OFFLINE_UNAVAILABLE = 8
 
   UNEXPECTED_EXCEPTION = 100
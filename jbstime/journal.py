@@ -0,0 +1,193 @@
+from datetime import date, datetime
+import json
+import uuid
+
+import click
+
+from . import api, config, req
+from .dates import date_fmt, find_sunday
+
+
+def journal_path():
+  return config.HOME() / 'journal.jsonl'
+
+
+def pending():
+  """
+    Returns the operations which haven't been sent. One an interrupted flush
+    was in the middle of sending has its state set to 'sending'.
+  """
+  ops = {}
+  try:
+    with journal_path().open() as f:
+      for line in f:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          # A line cut short by a crash
+          continue
+
+        if 'op' in entry:
+          ops[entry['id']] = entry
+        elif entry['id'] in ops:
+          ops[entry['id']]['state'] = entry['state']
+  except FileNotFoundError:
+    return []
+
+  return [op for op in ops.values() if op.get('state') != 'sent']
+
+
+def _append(op):
+  op['id'] = uuid.uuid4().hex
+  op['queued'] = datetime.now().isoformat()
+
+  config.HOME().mkdir(parents=True, exist_ok=True)
+  with journal_path().open('a') as f:
+    f.write(json.dumps(op, separators=(',', ':')) + '\n')
+
+
+def _mark(ops, state):
+  # Appended, so the mark is there even if the process dies right after
+  with journal_path().open('a') as f:
+    for op in ops:
+      op['state'] = state
+      f.write(json.dumps({'id': op['id'], 'state': state}, separators=(',', ':')) + '\n')
+
+
+def _rewrite(ops):
+  if not ops:
+    journal_path().unlink(missing_ok=True)
+    return
+
+  tmp = journal_path().with_suffix('.tmp')
+  with tmp.open('w') as f:
+    for op in ops:
+      f.write(json.dumps(op, separators=(',', ':')) + '\n')
+
+  tmp.replace(journal_path())
+
+
+def queue_add(d, project, hours, description, merge=True):
+  """
+    Checks an item against the saved project list and queues it to be added.
+  """
+  p, hours, description = api.validate_item(project, hours, description, offline=True)
+  _append({
+    'op': 'add',
+    'date': d.isoformat(),
+    'project': p.name,
+    'hours': str(hours),
+    'description': description,
+    'merge': merge,
+  })
+  return p
+
+
+def queue_delete(week, d, project, description):
+  """
+    Queues a deletion. The matching items are found when it is replayed.
+  """
+  _append({
+    'op': 'delete',
+    'week': week.isoformat(),
+    'date': d.isoformat() if d else None,
+    'project': project.lower(),
+    'description': description.lower() if description else None,
+  })
+
+
+def _week(op):
+  return date.fromisoformat(op['week']) if op['op'] == 'delete' else find_sunday(date.fromisoformat(op['date']))
+
+
+def flush(resend=False):
+  """
+    Replays the queued operations in order, one timesheet at a time, with
+    runs of adds sent as a batch. They're applied just as they would have
+    been online, so two identical adds add the hours twice.
+
+    Each operation is marked in the journal before it's sent and again once
+    it has gone through, so nothing is ever sent twice. If a flush was
+    interrupted while sending, those operations may or may not have been
+    applied, so they and the rest of their timesheet's operations stay
+    queued, unless resend is True. So do the operations for timesheets which
+    can't be changed. Returns the number of operations which were applied.
+  """
+  ops = pending()
+
+  weeks = []
+  for op in ops:
+    if _week(op) not in weeks:
+      weeks.append(_week(op))
+
+  kept = []
+  applied = 0
+  for week in weeks:
+    week_ops = [op for op in ops if _week(op) == week]
+    if not resend and any(op.get('state') == 'sending' for op in week_ops):
+      click.echo(
+        f'Keeping {len(week_ops)} queued change(s): some for the timesheet for {date_fmt(week)} may already have '
+        'been sent. Check it, then run `flush --resend` to send them anyway or `flush --forget` to drop them.',
+        err=True,
+      )
+      kept += week_ops
+      continue
+
+    timesheet = api.Timesheet.list().get(week)
+    if not timesheet or timesheet.locked:
+      reason = 'has been submitted' if timesheet else 'doesn\'t exist'
+      click.echo(f'Keeping {len(week_ops)} queued change(s): the timesheet for {date_fmt(week)} {reason}', err=True)
+      kept += week_ops
+      continue
+
+    _replay(timesheet, week_ops)
+    applied += len(week_ops)
+
+  _rewrite(kept)
+  return applied
+
+
+def forget():
+  """
+    Drops the operations an interrupted flush may already have sent. Returns
+    how many there were.
+  """
+  ops = pending()
+  kept = [op for op in ops if op.get('state') != 'sending']
+  _rewrite(kept)
+  return len(ops) - len(kept)
+
+
+def _groups(ops):
+  # Runs of adds that agree on merging go out together, and each delete on
+  # its own
+  group = []
+  for op in ops:
+    if group and (op['op'] == 'delete' or group[0]['op'] == 'delete' or op['merge'] != group[0]['merge']):
+      yield group
+      group = []
+
+    group.append(op)
+
+  if group:
+    yield group
+
+
+def _replay(timesheet, ops):
+  for group in _groups(ops):
+    # Marked only once nothing is left to check, so a group that can't be
+    # sent, such as one merging into too many hours, stays queued as it was
+    if group[0]['op'] == 'add':
+      timesheet.add_items([
+        (date.fromisoformat(op['date']), op['project'], op['hours'], op['description'])
+        for op in group
+      ], merge=group[0]['merge'], before_send=lambda: _mark(group, 'sending'))
+    else:
+      op = group[0]
+      d = date.fromisoformat(op['date']) if op['date'] else None
+      to_delete = [i for i in timesheet.items if api.item_matches(i, d, op['project'], op['description'])]
+      _mark(group, 'sending')
+      for _ in req.run_parallel(timesheet.delete_item, [(i.id,) for i in to_delete]):
+        pass
+
+    _mark(group, 'sent')
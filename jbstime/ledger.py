@@ -0,0 +1,57 @@
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from . import api
+
+
+# How long a PTO snapshot can be used before the index page is fetched again
+MAX_AGE = timedelta(hours=12)
+
+Ledger = namedtuple('Ledger', 'pto week items locked')
+ForecastWeek = namedtuple('ForecastWeek', 'date balance capped')
+
+
+def load(max_age=MAX_AGE):
+  """
+    Builds the ledger from the cached PTO snapshot and the stored items of the
+    timesheet it was taken against. Returns None if either is missing or the
+    snapshot is too old.
+  """
+  snapshot = api.cached_pto(max_age)
+  if snapshot is None:
+    return None
+
+  items = api.cached_items(snapshot.week)
+  if items is None:
+    return None
+
+  return Ledger(snapshot.pto, snapshot.week, items, snapshot.locked)
+
+
+def projected_balance(pto_info, items):
+  added_hours = Decimal('0')
+  removed_hours = Decimal('0')
+  for i in items:
+    if i.project.startswith('JBS - PTO'):
+      removed_hours += i.hours
+    else:
+      added_hours += i.hours
+
+  return pto_info.balance + (added_hours / pto_info.accrual * 8) - removed_hours
+
+
+def forecast(ledger, weeks, weekly_hours=40):
+  balance = projected_balance(ledger.pto, ledger.items)
+  earned = Decimal(weekly_hours) / ledger.pto.accrual * 8
+
+  result = []
+  for week in range(1, weeks + 1):
+    balance = min(balance + earned, Decimal(ledger.pto.cap))
+    result.append(ForecastWeek(
+      date=ledger.week + timedelta(weeks=week),
+      balance=balance,
+      capped=balance >= ledger.pto.cap,
+    ))
+
+  return result
@@ -0,0 +1,107 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+import threading
+
+import click
+
+from . import req, trace
+
+
+# The most bytes of page bodies which can be waiting to be parsed at once.
+# Fetching pauses when there are more.
+MAX_PENDING_BYTES = 32 * 1024 * 1024
+
+# Below this many pages, starting processes costs more than it saves, so the
+# pages are parsed on the fetching threads instead
+MIN_PAGES_FOR_PROCESSES = 8
+
+
+class _Budget:
+  def __init__(self, limit):
+    self.limit = limit
+    self.pending = 0
+    self._cond = threading.Condition()
+
+  def reserve(self, n):
+    # Waits until n more bytes fit and counts them, in one step, so bodies
+    # reserved at the same time can't add up to more than the limit. One body
+    # is always let through, however big, so nothing waits forever.
+    with self._cond:
+      while self.pending and self.pending + n > self.limit:
+        self._cond.wait()
+
+      self.pending += n
+      pending = self.pending
+
+    trace.gauge('pending page bytes', pending)
+
+  def release(self, n):
+    with self._cond:
+      self.pending -= n
+      self._cond.notify_all()
+
+
+def fetch_and_parse(urls, fetch, parse, skip=None, max_pending_bytes=MAX_PENDING_BYTES):
+  """
+    Fetches pages on threads and parses them in a pool of processes, yielding
+    (url, parsed) in the order of urls. fetch(url) returns a page's body, as
+    bytes, and its encoding, and parse(body, encoding) parses it. parse must
+    be a module-level function that returns plain data, so the results can be
+    sent back cheaply.
+
+    skip(url, body, encoding), if it's given, can return the parsed result
+    without sending the page to be parsed, or None to parse it. Fetching
+    stops while the bodies waiting to be parsed add up to max_pending_bytes,
+    so at most one more body per fetching thread is held beyond that.
+  """
+  urls = list(urls)
+  if not urls:
+    return
+
+  req.login()
+  ctx = click.get_current_context(silent=True)
+  budget = _Budget(max_pending_bytes)
+
+  processes = min(os.cpu_count() or 1, len(urls))
+  if len(urls) < MIN_PAGES_FOR_PROCESSES or processes < 2:
+    parsers = None
+  else:
+    # The fetching threads, and the requests session's connection pool, are
+    # already running, so the workers are started from a clean process rather
+    # than forked from this one
+    methods = multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    parsers = ProcessPoolExecutor(max_workers=processes, mp_context=mp_context)
+
+  def fetch_one(url):
+    page = req._with_context(ctx, fetch, url)
+
+    result = skip(url, *page) if skip else None
+    if result is not None:
+      future = Future()
+      future.set_result(result)
+      return future
+
+    if parsers is None:
+      future = Future()
+      future.set_result(parse(*page))
+      return future
+
+    # The body is only counted until a worker has parsed it. Until it fits,
+    # this thread waits, and so fetches nothing else.
+    n = len(page[0])
+    budget.reserve(n)
+    future = parsers.submit(parse, *page)
+    future.add_done_callback(lambda f: budget.release(n))
+    trace.count('pages parsed in processes')
+    return future
+
+  try:
+    with ThreadPoolExecutor(max_workers=req.MAX_WORKERS) as fetchers:
+      futures = [fetchers.submit(fetch_one, url) for url in urls]
+      for url, future in zip(urls, futures):
+        yield url, future.result().result()
+  finally:
+    if parsers is not None:
+      parsers.shutdown(cancel_futures=True)
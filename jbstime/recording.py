@@ -0,0 +1,124 @@
+import json
+from pathlib import Path
+import re
+import threading
+from urllib.parse import parse_qsl
+
+# Only req.record and req.replay import this module, so loading requests here
+# doesn't slow down shell completion
+import requests
+from requests.adapters import BaseAdapter
+from requests.cookies import cookiejar_from_dict
+
+from .req import CSRF_INPUT, SITE
+
+SCRUBBED = '**SCRUBBED**'
+TOKEN = '**TOKEN**'
+
+# Form fields which hold credentials or CSRF tokens
+SECRET_FIELDS = {'username': SCRUBBED, 'password': SCRUBBED, 'csrf_token': TOKEN, 'csrfmiddlewaretoken': TOKEN}
+
+
+class Recorder:
+  """
+    A response hook which saves each request and its response to a
+    directory, one JSON file per exchange, numbered in the order they
+    finished. Usernames, passwords and CSRF tokens are replaced wherever they
+    show up, so the recordings are safe to share.
+  """
+
+  def __init__(self, path):
+    self.path = Path(path)
+    self.path.mkdir(parents=True, exist_ok=True)
+    self._count = len(list(self.path.glob('*.json')))
+    self._secrets = {}
+    self._lock = threading.Lock()
+
+  def __call__(self, r, *args, **kw):
+    request = r.request
+    form = dict(parse_qsl(request.body)) if isinstance(request.body, str) else None
+
+    with self._lock:
+      # The secrets are collected first, so the page after the login doesn't
+      # give away who logged in
+      for name, value in (form or {}).items():
+        if name in SECRET_FIELDS and value:
+          self._secrets[value] = SECRET_FIELDS[name]
+
+      if r.cookies.get('csrftoken'):
+        self._secrets[r.cookies['csrftoken']] = TOKEN
+
+      if form is not None:
+        form = {name: SECRET_FIELDS.get(name, self._scrub(value)) for name, value in form.items()}
+
+      url = request.url[len(SITE):] if request.url.startswith(SITE) else request.url
+      exchange = {
+        'method': request.method,
+        'url': url,
+        'form': form,
+        'status': r.status_code,
+        'content_type': r.headers.get('Content-Type', '').split(';')[0],
+        'cookies': {name: TOKEN if name == 'csrftoken' else SCRUBBED for name in r.cookies.keys()},
+        'body': self._scrub(r.text),
+      }
+
+      self._count += 1
+      name = re.sub(r'\W+', '-', url).strip('-') or 'index'
+      path = self.path / f'{self._count:04}-{request.method}-{name}.json'
+      path.write_text(json.dumps(exchange, indent=2))
+
+  def _scrub(self, text):
+    text = CSRF_INPUT.sub(r'\g<1>' + TOKEN, text)
+    for value, replacement in self._secrets.items():
+      text = re.sub(rf'(?<!\w){re.escape(value)}(?!\w)', replacement, text)
+
+    return text
+
+
+class ReplayAdapter(BaseAdapter):
+  """
+    A transport which answers requests from a directory of recordings instead
+    of the network. Each request gets the recordings for its method and URL
+    in the order they were made, and the last one again once they run out,
+    so a replayed run always sees the same pages. Anything that wasn't
+    recorded gets a 404.
+  """
+
+  def __init__(self, path):
+    super().__init__()
+    self._exchanges = {}
+    for f in sorted(Path(path).glob('*.json')):
+      exchange = json.loads(f.read_text())
+      self._exchanges.setdefault((exchange['method'], exchange['url']), []).append(exchange)
+
+    self._served = {}
+    self._lock = threading.Lock()
+
+  def send(self, request, **kw):
+    key = (request.method, request.path_url)
+    with self._lock:
+      exchanges = self._exchanges.get(key)
+      n = self._served.get(key, 0)
+      self._served[key] = n + 1
+
+    r = requests.Response()
+    r.request = request
+    r.url = request.url
+    r.connection = self
+    r.encoding = 'utf-8'
+
+    if not exchanges:
+      r.status_code = 404
+      r.reason = 'Not Recorded'
+      r._content = f'Nothing was recorded for {request.method} {request.path_url}'.encode()
+      return r
+
+    exchange = exchanges[min(n, len(exchanges) - 1)]
+    r.status_code = exchange['status']
+    r._content = exchange['body'].encode()
+    r.headers['Content-Type'] = f'{exchange["content_type"]}; charset=utf-8'
+    r.cookies = cookiejar_from_dict(exchange['cookies'])
+    return r
+
+  def close(self):
+    pass
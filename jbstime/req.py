@@ -1,13 +1,115 @@
+import random
+import re
 import sys
+import threading
+import time
 
 import click
-import requests
+from click.globals import pop_context, push_context
 
-from . import config
+from . import config, trace
 from .error import Error
 
 
-s = requests.Session()
+# The most threads run_parallel will use. How many of them actually have a
+# request in flight is up to the limiter.
+MAX_WORKERS = 8
+
+SITE = 'https://timetrack.jbecker.com'
+
+# The token Django puts in each form. It changes with every page, unlike the
+# cookie's.
+CSRF_INPUT = re.compile(r'''(name=["']csrfmiddlewaretoken["'][^>]*?value=["'])[^"']*''')
+
+# Responses which mean the server is struggling, and a request can be tried again
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRIES = 3
+BACKOFF = 0.5
+
+_session = None
+_executor = None
+
+# Counts the posts sent, so anything fetched before a write can be recognized
+writes = 0
+
+# Pages being loaded ahead of time, by use and URL. The use is 'page' for
+# the page's content, or 'token' for the CSRF token a post to it will need.
+# Each is kept with the number of writes and whether the user was logged in
+# when it was requested, and is only used if neither has changed since: a
+# write changes the page, and logging in changes the token.
+_prefetched = {}
+
+
+class Limiter:
+  """
+    Limits how many requests are in flight at once, adjusting the limit as
+    the server responds. Each good response raises it by 1/limit, so about
+    one per round of requests, and each throttled, failed or dropped request
+    halves it.
+  """
+
+  def __init__(self, limit=4, minimum=1, maximum=MAX_WORKERS):
+    self.limit = float(limit)
+    self.minimum = minimum
+    self.maximum = maximum
+    self.in_flight = 0
+    self._cond = threading.Condition()
+
+  def acquire(self):
+    with self._cond:
+      while self.in_flight >= int(self.limit):
+        self._cond.wait()
+
+      self.in_flight += 1
+
+  def release(self, ok):
+    with self._cond:
+      self.in_flight -= 1
+      if ok:
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+      else:
+        self.limit = max(self.minimum, self.limit / 2)
+
+      self._cond.notify_all()
+
+    trace.gauge('http limit', round(self.limit, 2))
+
+
+limiter = Limiter()
+
+
+def session():
+  global _session
+  if _session is None:
+    # requests is imported here so that shell completion doesn't have to load it
+    import requests
+
+    from .transport import adapter
+
+    _session = requests.Session()
+    _session.headers['Accept-Encoding'] = 'gzip, deflate'
+    _session.headers['Connection'] = 'keep-alive'
+    _session.mount(SITE, adapter(limiter.maximum))
+
+  return _session
+
+
+def record(path):
+  """
+    Saves every request and response from now on to the directory at path,
+    scrubbed of credentials and CSRF tokens.
+  """
+  from .recording import Recorder
+  session().hooks['response'].append(Recorder(path))
+
+
+def replay(path):
+  """
+    Answers requests from the recordings in the directory at path instead of
+    the website.
+  """
+  from .recording import ReplayAdapter
+  session().mount(SITE, ReplayAdapter(path))
 
 
 def login():
@@ -22,53 +124,226 @@ def login():
   username = info.get('cmd_username') or conf['username']
   password = info.get('cmd_password') or conf['password']
 
+  if not username or not password:
+    # Connect and get the login form's token while the user types
+    prefetch('/accounts/login/', 'token', check_login=False)
+
   if not username:
     username = click.prompt('Username')
 
   if not password:
     password = click.prompt('Password', hide_input=True)
 
-  r = post('/accounts/login/', data={
-    'username': username,
-    'password': password,
-  }, check_login=False)
+  with trace.span('login'):
+    r = post('/accounts/login/', data={
+      'username': username,
+      'password': password,
+    }, check_login=False)
 
-  if 'Your username and password didn\'t match' in r.text:
+  if b'Your username and password didn\'t match' in r.content:
     click.echo('Login failed. Check your username and password.', err=True)
     sys.exit(Error.LOGIN_FAILED)
 
   info['logged_in'] = True
 
 
+def _logged_in():
+  ctx = click.get_current_context(silent=True)
+  return bool(ctx and ctx.obj and ctx.obj.get('logged_in'))
+
+
+def prefetch(url, *uses, check_login=True):
+  """
+    Starts loading a page in the background for each of uses, so that it's
+    ready when it's needed. A page that's already being loaded is shared,
+    unless something was written or the user logged in since.
+  """
+  state = (writes, _logged_in())
+  future = next((f for (_, u), (s, f) in _prefetched.items() if u == url and s == state), None)
+  if future is None:
+    future = submit(lambda: get(url, check_login=check_login))
+
+  for use in uses:
+    _prefetched[use, url] = (state, future)
+
+
+def prefetched(use, url):
+  """
+    Returns the response prefetched for a use of a page, or None if there
+    isn't one that's still good. Either way, it's only returned once.
+  """
+  state, future = _prefetched.pop((use, url), (None, None))
+  if future is None or state != (writes, _logged_in()):
+    return None
+
+  try:
+    return future.result()
+  except Exception:
+    # It'll be loaded again, and anything wrong reported then
+    return None
+
+
+def forget_prefetched():
+  _prefetched.clear()
+
+
+def _prefetched_token(url):
+  r = prefetched('token', url)
+  if r is None or 'csrftoken' not in r.cookies:
+    return None
+
+  trace.count('prefetched csrf tokens')
+  return r
+
+
 def get(url, *args, check_login=True, **kw):
   if check_login:
     login()
 
-  url = 'https://timetrack.jbecker.com' + url
-  r = s.get(url, *args, **kw)
+  with trace.span(f'GET {url}') as span:
+    r = _request('get', url, *args, **kw)
+    span['status'] = r.status_code
+    span['bytes'] = len(r.content)
+
+  trace.count('http requests')
+  trace.count('http bytes', len(r.content))
   r.raise_for_status()
   return r
 
 
-def post(url, data, *args, referer=None, xhr=False, check_login=True, **kw):
+def post(url, data, *args, referer=None, xhr=False, check_login=True, verify=None, **kw):
+  """
+    Posts a form with the CSRF token from the referer page. A post that fails
+    is only sent again if verify is given and says the first one didn't take
+    effect; if it did, None is returned.
+  """
+  global writes
+
   if check_login:
     login()
 
-  referer = referer or url
-  r = get(referer, check_login=check_login)
-  csrf_token = r.cookies['csrftoken']
+  # The span includes the GET for the referer, which is where the CSRF token
+  # comes from
+  with trace.span(f'POST {url}') as span:
+    referer = referer or url
+    r = _prefetched_token(referer) or get(referer, check_login=check_login)
+    csrf_token = r.cookies['csrftoken']
+
+    data['csrf_token'] = csrf_token
+    data['csrfmiddlewaretoken'] = csrf_token
+    kw['headers'] = {
+      'X-CSRFToken': csrf_token,
+      'Referer': SITE + referer,
+    }
+
+    if xhr:
+      kw['headers']['X-Requested-With'] = 'XMLHttpRequest'
 
-  data['csrf_token'] = csrf_token
-  data['csrfmiddlewaretoken'] = csrf_token
-  kw['headers'] = {
-    'X-CSRFToken': csrf_token,
-    'Referer': 'https://timetrack.jbecker.com' + referer,
-  }
+    # Counted once the referer is in hand, since it's only the post itself
+    # that makes anything prefetched out of date
+    writes += 1
+    r = _request('post', url, *args, data=data, verify=verify, **kw)
+    if r is None:
+      return None
 
-  if xhr:
-    kw['headers']['X-Requested-With'] = 'XMLHttpRequest'
+    span['status'] = r.status_code
 
-  url = 'https://timetrack.jbecker.com' + url
-  r = s.post(url, *args, data=data, **kw)
+  trace.count('http requests')
+  trace.count('http bytes', len(r.content))
   r.raise_for_status()
   return r
+
+
+def _request(method, url, *args, verify=None, **kw):
+  """
+    Sends a request once the limiter allows it. GETs are tried again after a
+    connection error, throttling or a server error, with a jittered backoff.
+    Posts aren't safe to repeat, so they're only tried again when verify()
+    says the last attempt didn't go through.
+  """
+  import requests
+
+  for attempt in range(RETRIES + 1):
+    r = None
+    error = None
+    ok = False
+
+    limiter.acquire()
+    try:
+      r = getattr(session(), method)(SITE + url, *args, **kw)
+      ok = r.status_code not in RETRY_STATUSES
+    except (requests.ConnectionError, requests.Timeout) as e:
+      error = e
+    finally:
+      limiter.release(ok)
+
+    if ok or attempt == RETRIES or (method == 'post' and verify is None):
+      break
+
+    if method == 'post' and verify():
+      trace.count('http posts already applied')
+      return None
+
+    trace.count('http retries')
+    time.sleep(_backoff(attempt, r))
+
+  if error:
+    raise error
+
+  return r
+
+
+def _backoff(attempt, r=None):
+  # The server's Retry-After wins when it gives one. Otherwise the delay is
+  # random up to an exponential cap, so parallel requests don't retry in step.
+  retry_after = r.headers.get('Retry-After', '') if r is not None else ''
+  if retry_after.isdigit():
+    return min(int(retry_after), 60)
+
+  return random.uniform(0, BACKOFF * 2 ** attempt)
+
+
+def _with_context(ctx, func, *args):
+  if ctx is None:
+    return func(*args)
+
+  push_context(ctx)
+  try:
+    return func(*args)
+  finally:
+    pop_context()
+
+
+def submit(func, *args):
+  """
+    Runs func(*args) on a shared pool of background threads, returning a
+    Future. The current click context is made available to it.
+  """
+  global _executor
+  if _executor is None:
+    # Imported here, like everything only some commands need, so that shell
+    # completion doesn't load it
+    from concurrent.futures import ThreadPoolExecutor
+
+    _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+  return _executor.submit(_with_context, click.get_current_context(silent=True), func, *args)
+
+
+def run_parallel(func, args_list, max_workers=MAX_WORKERS):
+  """
+    Calls func(*args) for each entry in args_list on a pool of threads,
+    yielding the results in order. The login happens once up front, and the
+    current click context is made available to every worker so they share it.
+  """
+  args_list = list(args_list)
+  if not args_list:
+    return
+
+  from concurrent.futures import ThreadPoolExecutor
+
+  login()
+  ctx = click.get_current_context(silent=True)
+
+  with ThreadPoolExecutor(max_workers=min(max_workers, len(args_list))) as pool:
+    yield from pool.map(lambda args: _with_context(ctx, func, *args), args_list)
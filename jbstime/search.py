@@ -0,0 +1,86 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+import math
+import re
+
+from . import cache
+
+
+Hit = namedtuple('Hit', 'score date project hours description')
+
+
+def tokenize(text):
+  return re.findall(r'\w+', text.lower())
+
+
+def index_weeks(rows_by_week):
+  """
+    Updates the index with the items of some timesheets, replacing whatever
+    was indexed for them before. Items are the rows saved in the item
+    history, and are referred to by their position there.
+  """
+  with cache.lock:
+    index = cache.load('search', {'format': cache.FORMAT, 'tokens': {}, 'weeks': {}}, format=cache.FORMAT)
+    tokens = index['tokens']
+
+    for week, rows in rows_by_week.items():
+      for token in index['weeks'].get(week, []):
+        postings = [p for p in tokens.get(token, []) if p[0] != week]
+        if postings:
+          tokens[token] = postings
+        else:
+          tokens.pop(token, None)
+
+      week_tokens = set()
+      for i, (id, hours, d, project, description) in enumerate(rows):
+        counts = {}
+        for token in tokenize(project) + tokenize(description):
+          counts[token] = counts.get(token, 0) + 1
+
+        for token, tf in counts.items():
+          tokens.setdefault(token, []).append([week, i, tf])
+
+        week_tokens.update(counts)
+
+      index['weeks'][week] = sorted(week_tokens)
+
+    cache.save('search', index)
+
+
+def search(query, project=None, start=None, end=None, limit=20):
+  """
+    Finds the items that best match a query. Items matching more of the
+    query's words come first, then those where the words are rarer, then the
+    most recent. project limits the results to projects whose names contain
+    it, and start and end to a range of dates.
+  """
+  index = cache.load('search', {'tokens': {}, 'weeks': {}}, format=cache.FORMAT)
+  history = cache.load('items', {'weeks': {}}, format=cache.FORMAT)['weeks']
+  total = sum(len(rows) for rows in history.values()) or 1
+
+  matched = {}
+  scores = {}
+  for token in set(tokenize(query)):
+    postings = index['tokens'].get(token, [])
+    idf = math.log(1 + total / len(postings)) if postings else 0
+    for week, i, tf in postings:
+      matched[week, i] = matched.get((week, i), 0) + 1
+      scores[week, i] = scores.get((week, i), 0) + tf * idf
+
+  project = project.lower() if project else None
+  hits = []
+  for week, i in matched:
+    id, hours, d, item_project, description = history[week][i]
+    d = date.fromisoformat(d)
+    if project and project not in item_project.lower():
+      continue
+
+    if (start and d < start) or (end and d > end):
+      continue
+
+    hit = Hit(scores[week, i], d, item_project, Decimal(hours), description)
+    hits.append((matched[week, i], hit.score, d, hit))
+
+  hits.sort(key=lambda h: h[:3], reverse=True)
+  return [h[-1] for h in hits[:limit]]
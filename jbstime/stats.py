@@ -0,0 +1,120 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import json
+import math
+import re
+import time
+
+from . import config, trace
+
+
+# Counters which mean a request or a parse was saved
+CACHE_HITS = ('prefetch hits', 'pages unchanged', 'prefetched csrf tokens')
+
+Summary = namedtuple('Summary', 'name runs p50 p95 p99 requests hits')
+
+
+def stats_path():
+  return config.HOME() / 'stats.jsonl'
+
+
+def endpoint(name):
+  # Timesheet ids and query strings would make every page its own endpoint
+  return re.sub(r'/\d+/', '/<id>/', name.split('?')[0])
+
+
+class Recorder:
+  """
+    Gathers the spans and counters of one command, and appends a line about
+    it to the stats file when it's done.
+  """
+
+  def __init__(self, command):
+    self.command = command
+    self.start = time.perf_counter()
+    self.profile = trace.collect()
+
+  def finish(self):
+    trace.stop_collecting(self.profile)
+
+    spans = self.profile.spans
+    counters = self.profile.counters
+    writes = sum(seconds for name, (calls, seconds) in spans.items() if name.startswith('POST /timesheet'))
+
+    endpoints = {}
+    for name, (calls, seconds) in spans.items():
+      if name.startswith(('GET ', 'POST ')):
+        total = endpoints.setdefault(endpoint(name), [0, 0])
+        total[0] += calls
+        total[1] += round(seconds * 1000)
+
+    record = {
+      'at': datetime.now().isoformat(timespec='seconds'),
+      'command': self.command,
+      'ms': round((time.perf_counter() - self.start) * 1000),
+      'requests': counters.get('http requests', 0),
+      'bytes': counters.get('http bytes', 0),
+      'hits': sum(counters.get(name, 0) for name in CACHE_HITS),
+      'phases': {
+        'login': round(spans.get('login', [0, 0])[1] * 1000),
+        'index': round(spans.get('load index', [0, 0])[1] * 1000),
+        'index parse': round(spans.get('parse index', [0, 0])[1] * 1000),
+        'reload': round(spans.get('load timesheet', [0, 0])[1] * 1000),
+        'reload parse': round(spans.get('parse timesheet', [0, 0])[1] * 1000),
+        'writes': round(writes * 1000),
+      },
+      'endpoints': endpoints,
+    }
+
+    # Like the cache, nothing is recorded unless there's a .jbstime directory
+    if config.HOME().exists():
+      with stats_path().open('a') as f:
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def load():
+  try:
+    with stats_path().open() as f:
+      return [json.loads(line) for line in f if line.strip()]
+  except FileNotFoundError:
+    return []
+
+
+def percentile(values, p):
+  # The nearest-rank percentile
+  values = sorted(values)
+  return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(records, days=30):
+  """
+    Returns Summaries of how long each command took, and of how long each
+    endpoint took per request, over the records from the last number of days.
+  """
+  since = datetime.now() - timedelta(days=days)
+  records = [r for r in records if datetime.fromisoformat(r['at']) >= since]
+
+  by_command = {}
+  by_endpoint = {}
+  for r in records:
+    by_command.setdefault(r['command'], []).append(r)
+    for name, (calls, ms) in r['endpoints'].items():
+      # Only the total is kept, so each request counts as the average
+      by_endpoint.setdefault(name, []).extend([ms / calls] * calls)
+
+  commands = []
+  for name, runs in sorted(by_command.items()):
+    times = [r['ms'] for r in runs]
+    commands.append(Summary(
+      name, len(runs), percentile(times, 50), percentile(times, 95), percentile(times, 99),
+      sum(r['requests'] for r in runs) / len(runs),
+      sum(r['hits'] for r in runs) / len(runs),
+    ))
+
+  endpoints = []
+  for name, times in sorted(by_endpoint.items()):
+    endpoints.append(Summary(
+      name, len(times), percentile(times, 50), percentile(times, 95), percentile(times, 99), None, None,
+    ))
+
+  return commands, endpoints
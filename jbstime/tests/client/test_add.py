@@ -48,3 +48,16 @@ def test_pto(mock_pto, run):
   result = run('add', '5/18/2020', 'Test Project', '8', 'Testing')
   assert result.exit_code == 0
   assert 'exceeds your PTO cap\nCurrent timesheet puts you at 12.41. Cap is 10.0' in result.output
+
+
+def test_partial_project(run):
+  result = run('add', '5/18/2020', 'test proj', '8', 'Testing')
+  assert result.exit_code == 0
+
+  result = run('add', '5/18/2020', 'PTO', '8', 'Testing')
+  assert result.exit_code == Error.INVALID_ARGUMENT
+  assert result.output == 'Ambiguous project: PTO\nIt could be any of:\n  JBS - PTO\n  JBS - PTO Exchange\n'
+
+  result = run('add', '5/18/2020', 'Tset Project', '8', 'Testing')
+  assert result.exit_code == Error.INVALID_ARGUMENT
+  assert result.output == 'Invalid project: Tset Project\nDid you mean: Test Project?\n'
@@ -1,9 +1,9 @@
 from datetime import date
 from decimal import Decimal
-from unittest.mock import call, patch, PropertyMock
+from unittest.mock import patch, PropertyMock
 
 from jbstime import req
-from jbstime.api import TimesheetItem
+from jbstime.api import Timesheet, TimesheetItem
 from jbstime.error import Error
 
 
@@ -17,6 +17,11 @@ def look_for_hours(func, date, project, hours):
   return False
 
 
+def batches(mock_add):
+  # The entries sent to each add_items call, with its options
+  return [(c[0][0], c[1]) for c in mock_add.call_args_list]
+
+
 def look_for_delete(func, id):
   for c in func.call_args_list:
     data = c[1]['data']
@@ -27,40 +32,38 @@ def look_for_delete(func, id):
   return False
 
 
-@patch('jbstime.api.Timesheet.add_item')
+@patch('jbstime.api.Timesheet.add_items')
 def test_addall(mock_add, run):
-  mock_add.return_value = True
+  mock_add.return_value = [True] * 5
   result = run('addall', '5/18/2020', 'Test Project', '8', 'Testing')
   assert result.exit_code == 0
-  assert mock_add.call_count == 5
-  mock_add.assert_has_calls([
-    call(date(2020, 5, 18), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 19), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 20), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 21), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 22), 'Test Project', '8', 'Testing', fill=True, merge=True),
-  ], any_order=True)
+  assert batches(mock_add) == [([
+    (date(2020, 5, 22), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 21), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 20), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 19), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 18), 'Test Project', '8', 'Testing'),
+  ], {'fill': True, 'merge': True})]
 
 
-@patch('jbstime.api.Timesheet.add_item')
+@patch('jbstime.api.Timesheet.add_items')
 @patch('jbstime.api.list_holidays')
 def test_holidays(mock_holidays, mock_add, run):
   mock_holidays.return_value = {
     date(2020, 5, 18): 'Holiday A',
   }
-  mock_add.return_value = True
+  mock_add.return_value = [True] * 5
   result = run('addall', '5/18/2020', 'Test Project', '8', 'Testing', input='y')
   assert result.exit_code == 0
   assert result.output.startswith('May 18, 2020 was Holiday A\n')
   assert 'Set holidays to time off?' in result.output
-  assert mock_add.call_count == 5
-  mock_add.assert_has_calls([
-    call(date(2020, 5, 18), 'JBS - Paid Holiday', 8, 'Holiday A', fill=True, merge=True),
-    call(date(2020, 5, 19), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 20), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 21), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 22), 'Test Project', '8', 'Testing', fill=True, merge=True),
-  ], any_order=True)
+  assert batches(mock_add) == [([
+    (date(2020, 5, 22), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 21), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 20), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 19), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 18), 'JBS - Paid Holiday', 8, 'Holiday A'),
+  ], {'fill': True, 'merge': True})]
 
   mock_holidays.return_value = {
     date(2020, 5, 18): 'Holiday A',
@@ -71,14 +74,13 @@ def test_holidays(mock_holidays, mock_add, run):
   assert result.exit_code == 0
   assert result.output.startswith('May 18, 2020 was Holiday A and May 19, 2020 was Holiday B\n')
   assert 'Set holidays to time off?' in result.output
-  assert mock_add.call_count == 5
-  mock_add.assert_has_calls([
-    call(date(2020, 5, 18), 'JBS - Paid Holiday', 8, 'Holiday A', fill=True, merge=True),
-    call(date(2020, 5, 19), 'JBS - Paid Holiday', 8, 'Holiday B', fill=True, merge=True),
-    call(date(2020, 5, 20), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 21), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 22), 'Test Project', '8', 'Testing', fill=True, merge=True),
-  ], any_order=True)
+  assert batches(mock_add) == [([
+    (date(2020, 5, 22), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 21), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 20), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 19), 'JBS - Paid Holiday', 8, 'Holiday B'),
+    (date(2020, 5, 18), 'JBS - Paid Holiday', 8, 'Holiday A'),
+  ], {'fill': True, 'merge': True})]
 
   mock_holidays.return_value = {
     date(2020, 5, 18): 'Holiday A',
@@ -90,14 +92,13 @@ def test_holidays(mock_holidays, mock_add, run):
   assert result.exit_code == 0
   assert 'May 18, 2020 was Holiday A, May 19, 2020 was Holiday B, and May 20, 2020 was Holiday C\n' in result.output
   assert 'Set holidays to time off?' in result.output
-  assert mock_add.call_count == 5
-  mock_add.assert_has_calls([
-    call(date(2020, 5, 18), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 19), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 20), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 21), 'Test Project', '8', 'Testing', fill=True, merge=True),
-    call(date(2020, 5, 22), 'Test Project', '8', 'Testing', fill=True, merge=True),
-  ], any_order=True)
+  assert batches(mock_add) == [([
+    (date(2020, 5, 22), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 21), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 20), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 19), 'Test Project', '8', 'Testing'),
+    (date(2020, 5, 18), 'Test Project', '8', 'Testing'),
+  ], {'fill': True, 'merge': True})]
 
 
 @patch('jbstime.api.list_holidays')
@@ -187,3 +188,45 @@ def test_merge(mock_items, run):
 
     result = run('addall', '5/18/2020', 'Test Project', '96', 'Test Merge', '--no-fill', '--no-merge', input='y')
     assert result.exit_code == 0
+
+
+@patch('jbstime.api.Timesheet.create')
+@patch('jbstime.api.Timesheet.add_items')
+def test_range(mock_add, mock_create, run):
+  def create(d, known):
+    assert d not in known
+    Timesheet.list()[d] = Timesheet(str(d.day), d, Decimal('0'), Decimal('0'), False)
+
+  mock_create.side_effect = create
+  mock_add.return_value = [True] * 5
+  result = run('addall', '5/17/2020', 'Test Project', '8', 'Testing', '--to', '6/3/2020', input='n')
+  assert result.exit_code == 0
+  assert 'Created 2 timesheets\n' in result.output
+  assert 'Skipping the timesheet for May 17, 2020' in result.output
+  assert mock_create.call_count == 2
+
+  # One batch for each week
+  entries = sorted(e for batch, options in batches(mock_add) for e in batch)
+  assert mock_add.call_count == 3
+  assert len(entries) == 15
+  assert entries[0] == (date(2020, 5, 18), 'Test Project', '8', 'Testing')
+  assert entries[-1] == (date(2020, 6, 5), 'Test Project', '8', 'Testing')
+
+  result = run('addall', '5/17/2020', 'Test Project', '8')
+  assert result.exit_code == 2
+
+  result = run('addall', '6/3/2020', 'Test Project', '8', 'Testing', '--to', '5/17/2020')
+  assert result.exit_code == Error.INVALID_ARGUMENT
+
+
+def test_requests(urls, run):
+  urls.reset_mock()
+  result = run('addall', '5/24/2020', 'Test Project', '8', 'Testing', '--no-fill')
+  assert result.exit_code == 0
+
+  # At most the prefetched page, one for each post's CSRF token, and the
+  # reload for the PTO report
+  requests = [(r.method, r.path) for r in urls.request_history]
+  assert requests.count(('GET', '/timesheet/27358/')) == 7
+  assert requests.count(('POST', '/timesheet/27358/')) == 5
+  assert requests.count(('GET', '/')) == 1
@@ -0,0 +1,79 @@
+from decimal import Decimal
+import json
+from unittest.mock import patch
+
+import requests
+
+from jbstime import req
+from jbstime.api import PTO
+from jbstime.error import Error
+
+
+SCRIPT = '''
+# Fill out the week
+add 5/18/2020 "Test Project" 8 Testing
+add 5/19/2020 "Test Project" 8 "More testing"
+add 5/20/2020 "Test Project" foo Testing
+bogus
+delete 5/24/2020 "Test Project" --all
+add 5/21/2020 "Test Project 8 Testing
+'''
+
+
+def urls(func):
+  return [c[0][0] for c in func.call_args_list]
+
+
+@patch('jbstime.api.pto')
+def test_batch(mock_pto, run):
+  mock_pto.return_value = PTO(
+    balance=Decimal('9.5'),
+    cap=Decimal('10.0'),
+    earned=Decimal('100.0'),
+    used=Decimal('90.5'),
+    accrual=110
+  )
+
+  with patch('jbstime.req.get', wraps=req.get) as get_func:
+    result = run('batch', '-', input=SCRIPT)
+
+  assert result.exit_code == Error.INVALID_ARGUMENT
+  results = [json.loads(line) for line in result.output.splitlines()]
+  assert [(r['line'], r['exit_code']) for r in results] == [(3, 0), (4, 0), (5, 2), (6, 2), (7, 0), (8, 2)]
+
+  # The PTO report only comes at the end of the adds
+  assert results[0]['output'] == results[1]['output'] == ''
+  assert 'exceeds your PTO cap' in results[2]['output']
+  assert results[2]['errors'] == 'Invalid hours: foo\n'
+  assert 'No such command' in results[3]['errors']
+  assert results[4]['output'] == '5 items to delete\nAre you sure? [y/N]: n\n'
+  assert 'No closing quotation' in results[5]['errors']
+
+  # One login and index for the whole batch
+  assert urls(get_func).count('/accounts/login/') == 1
+  assert urls(get_func).count('/?all=1') == 1
+
+
+def test_batch_yes(run):
+  with patch('jbstime.req.post', wraps=req.post) as post_func:
+    result = run('batch', '--yes', '-', input='delete 5/24/2020 "Test Project" --all\n')
+    assert result.exit_code == 0
+    assert json.loads(result.output)['exit_code'] == 0
+    assert [c[1]['data'].get('action') for c in post_func.call_args_list].count('delete') == 5
+
+
+def test_batch_nested(run):
+  result = run('batch', '-', input='batch -\n')
+  assert json.loads(result.output)['errors'] == 'Error: batch can\'t be run from a batch\n'
+
+
+def test_batch_unexpected_error(run):
+  script = 'add 5/18/2020 "Test Project" 8 Testing\nadd 5/19/2020 "Test Project" 8 Testing --no-merge\n'
+  with patch('jbstime.api.Timesheet.add_items', side_effect=[requests.HTTPError('500 Server Error'), [True]]):
+    result = run('batch', '-', input=script)
+
+  # The failure is reported for its line, and the next line still runs
+  assert result.exit_code == Error.UNEXPECTED_EXCEPTION
+  results = [json.loads(line) for line in result.output.splitlines()]
+  assert [(r['line'], r['exit_code']) for r in results] == [(1, Error.UNEXPECTED_EXCEPTION), (2, 0)]
+  assert results[0]['errors'] == 'Unexpected error: 500 Server Error\n'
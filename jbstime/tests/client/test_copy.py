@@ -0,0 +1,68 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch, PropertyMock
+
+from jbstime import req
+from jbstime.api import Timesheet, TimesheetItem
+from jbstime.error import Error
+
+
+def look_for_hours(func, date, hours):
+  return any(
+    c[1]['data'].get('log_date') == date and c[1]['data'].get('hours_worked') == hours
+    for c in func.call_args_list
+  )
+
+
+def test_copy(run):
+  with patch('jbstime.req.post', wraps=req.post) as post_func:
+    result = run('copy', '5/17/2020', '5/24/2020')
+    assert result.exit_code == 0
+    assert result.output == 'Copied 5 items to the timesheet for May 24, 2020\n'
+
+    assert sum('hours_worked' in c[1]['data'] for c in post_func.call_args_list) == 5
+    for day in range(18, 23):
+      assert look_for_hours(post_func, f'05/{day}/2020', Decimal('8.00'))
+
+  result = run('copy', '5/17/2020', '5/16/2020')
+  assert result.exit_code == Error.INVALID_ARGUMENT
+
+  result = run('copy', '5/24/2020', '5/17/2020')
+  assert result.exit_code == Error.TIMESHEET_SUBMITTED
+
+
+@patch('jbstime.api.Timesheet.create')
+def test_copy_create(mock_create, run):
+  missing = date(2020, 5, 31)
+  latest = Timesheet('27358', missing, Decimal('0'), Decimal('0'), False)
+
+  def create(d):
+    timesheets = Timesheet.list()
+    timesheets[d] = latest
+
+  mock_create.side_effect = create
+  with patch('jbstime.api.Timesheet.add_items', return_value=[True]) as mock_add:
+    result = run('copy', '5/17/2020', '5/31/2020')
+    assert result.exit_code == 0
+    assert result.output.startswith('Created timesheet for May 31, 2020\nCopied 1 item')
+    mock_create.assert_called_once_with(missing)
+    assert sorted(e[0] for e in mock_add.call_args[0][0])[0] == date(2020, 5, 25)
+
+
+@patch('jbstime.api.Timesheet.items', new_callable=PropertyMock)
+def test_add_items(mock_items, run):
+  mock_items.return_value = set([
+    TimesheetItem(1, Decimal('4.0'), date(2020, 5, 18), 'Test Project', 'Merge'),
+  ])
+  timesheet = Timesheet.list()[date(2020, 5, 24)]
+
+  with patch('jbstime.req.post', wraps=req.post) as post_func:
+    results = timesheet.add_items([
+      (date(2020, 5, 18), 'Test Project', '2', 'Merge'),
+      (date(2020, 5, 18), 'Test Project', '1', 'Merge'),
+      (date(2020, 5, 18), 'Test Project', '4', 'Other'),
+    ], fill=True)
+
+    assert results == [True, True, True]
+    hours = sorted(c[1]['data']['hours_worked'] for c in post_func.call_args_list if 'hours_worked' in c[1]['data'])
+    assert hours == [Decimal('1.0'), Decimal('7.0')]
@@ -206,3 +206,35 @@ def test_config(run, no_config):
   result = run('config', input='foo\nbar\n')
   assert result.exit_code == 0
   assert result.output.startswith('Username: foo\nPassword: \nConfig written to')
+
+
+def test_projects_similar(run):
+  result = run('projects', 'tset project')
+  assert result.exit_code == 0
+  assert result.output == 'Test Project\n'
+
+
+@patch('jbstime.api.Timesheet.submit')
+def test_submit_many(mock_submit, run):
+  result = run('submit', '--range', '5/1/2020', '5/31/2020', input='n')
+  assert result.exit_code == 0
+  assert result.output == '''1 timesheet to submit:
+  May 24, 2020   24.00  (fewer than 40 hours)
+1 timesheet has fewer than 40 hours logged.
+Submit them? [y/N]: n
+'''
+  mock_submit.assert_not_called()
+
+  result = run('submit', '--all-unsubmitted', input='y')
+  assert result.exit_code == 0
+  assert result.output.endswith('Submit them? [y/N]: y\nSubmitted timesheet for May 24, 2020\n')
+  mock_submit.assert_called_once()
+
+  mock_submit.side_effect = Exception('Server error')
+  result = run('submit', '--all-unsubmitted', input='y')
+  assert result.exit_code == Error.UNEXPECTED_EXCEPTION
+  assert 'Failed to submit timesheet for May 24, 2020: Server error' in result.output
+
+  result = run('submit', '--range', '5/1/2020', '5/17/2020')
+  assert result.exit_code == 0
+  assert result.output == 'No unsubmitted timesheets\n'
@@ -0,0 +1,177 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import ANY, patch, PropertyMock
+
+from jbstime import journal, req
+from jbstime.api import TimesheetItem
+from jbstime.config import HOME
+from jbstime.error import Error
+
+
+def posted(func):
+  return [c[1]['data'] for c in func.call_args_list if 'csrf_token' in c[1]['data'] and 'username' not in c[1]['data']]
+
+
+def test_no_catalog(run):
+  result = run('--offline', 'add', '5/18/2020', 'Test Project', '8', 'Testing')
+  assert result.exit_code == Error.OFFLINE_UNAVAILABLE
+
+
+def test_queue_and_flush(run, fs):
+  fs.create_dir(HOME())
+  run('projects')
+
+  with patch('jbstime.req.get', side_effect=AssertionError('offline')):
+    result = run('--offline', 'add', '5/18/2020', 'test proj', '8', 'Testing')
+    assert result.exit_code == 0
+    assert result.output == 'Queued Test Project on May 18, 2020\n'
+
+    result = run('--offline', 'add', '5/18/2020', 'test proj', '8', 'Testing')
+    assert result.exit_code == 0
+
+    result = run('--offline', 'add', '5/18/2020', 'Test Project', 'foo', 'Testing')
+    assert result.exit_code == Error.INVALID_ARGUMENT
+
+    result = run('--offline', 'delete', '5/19/2020', 'Test Project', input='y')
+    assert result.exit_code == 0
+
+    result = run('--offline', 'add', '5/11/2020', 'Test Project', '8', 'Testing')
+    assert result.exit_code == 0
+
+  assert len(journal.pending()) == 4
+
+  with patch('jbstime.req.post', wraps=req.post) as post_func:
+    result = run('flush')
+    assert result.exit_code == 0
+    assert 'Sending 4 queued changes' in result.output
+    assert 'Keeping 1 queued change(s): the timesheet for May 17, 2020 has been submitted' in result.output
+    assert 'Sent 3 queued changes' in result.output
+
+    # The two adds are merged, just as they would have been online
+    data = posted(post_func)
+    assert len(data) == 1
+    assert data[0]['log_date'] == '05/18/2020'
+    assert data[0]['hours_worked'] == Decimal('16')
+
+  assert [op['date'] for op in journal.pending()] == ['2020-05-11']
+
+
+@patch('jbstime.api.Timesheet.items', new_callable=PropertyMock)
+def test_flush_merges(mock_items, run, fs):
+  fs.create_dir(HOME())
+  run('projects')
+  run('--offline', 'add', '5/18/2020', 'Test Project', '8', 'Testing')
+  run('--offline', 'delete', '5/19/2020', 'Test Project', input='y')
+
+  mock_items.return_value = set([
+    TimesheetItem('1', Decimal('8'), date(2020, 5, 18), 'Test Project', 'Testing'),
+    TimesheetItem('2', Decimal('8'), date(2020, 5, 19), 'Test Project', 'Other'),
+  ])
+
+  with patch('jbstime.req.post', wraps=req.post) as post_func:
+    result = run('timesheets')
+    assert result.exit_code == 0
+    assert result.output.startswith('Sending 2 queued changes\nSent 2 queued changes\nMay 24, 2020')
+
+    # An identical item already there is merged with, not skipped
+    data = posted(post_func)
+    assert len(data) == 3
+    assert {'id': '1', 'action': 'delete', 'csrf_token': '**TOKEN**', 'csrfmiddlewaretoken': '**TOKEN**'} in data
+    assert {'id': '2', 'action': 'delete', 'csrf_token': '**TOKEN**', 'csrfmiddlewaretoken': '**TOKEN**'} in data
+    assert [d['hours_worked'] for d in data if 'hours_worked' in d] == [Decimal('16')]
+
+  assert journal.pending() == []
+
+  result = run('flush')
+  assert result.output == 'Nothing is queued\n'
+
+
+def sends(*outcomes):
+  # Stands in for add_items, getting as far as sending each time before
+  # returning or raising the next outcome
+  outcomes = list(outcomes)
+
+  def add_items(entries, merge=True, before_send=None):
+    before_send()
+    outcome = outcomes.pop(0)
+    if outcome is KeyboardInterrupt:
+      raise outcome
+
+    return outcome
+
+  return add_items
+
+
+def test_flush_interrupted(run, fs):
+  fs.create_dir(HOME())
+  run('projects')
+  run('--offline', 'add', '5/18/2020', 'Test Project', '8', 'Testing')
+  run('--offline', 'add', '5/19/2020', 'Test Project', '8', 'Testing', '--no-merge')
+
+  # The first batch goes through, then the process dies sending the second
+  with patch('jbstime.api.Timesheet.add_items', side_effect=sends([True], KeyboardInterrupt)) as add_items:
+    result = run('flush')
+    assert add_items.call_count == 2
+
+  assert [op['state'] for op in journal.pending()] == ['sending']
+
+  # What was sent isn't sent again, and what may have been is held back
+  with patch('jbstime.api.Timesheet.add_items') as add_items:
+    result = run('flush')
+    assert 'may already have been sent' in result.output
+    add_items.assert_not_called()
+
+    result = run('flush', '--resend')
+    assert result.exit_code == 0
+    assert 'Sent 1 queued change' in result.output
+    add_items.assert_called_once_with(
+      [(date(2020, 5, 19), 'Test Project', '8', 'Testing')], merge=False, before_send=ANY,
+    )
+
+  assert journal.pending() == []
+
+  run('--offline', 'add', '5/19/2020', 'Test Project', '8', 'Testing')
+  with patch('jbstime.api.Timesheet.add_items', side_effect=sends(KeyboardInterrupt)):
+    run('flush')
+
+  result = run('flush', '--forget')
+  assert result.output == 'Dropped 1 change\n'
+  assert journal.pending() == []
+
+
+def test_flush_invalid(run, fs):
+  fs.create_dir(HOME())
+  run('projects')
+  run('--offline', 'add', '5/18/2020', 'Test Project', '60', 'Testing')
+  run('--offline', 'add', '5/18/2020', 'Test Project', '60', 'Testing')
+
+  # Merged, the adds are too many hours, which is found before anything is sent
+  with patch('jbstime.req.post', wraps=req.post) as post_func:
+    result = run('flush')
+    assert result.exit_code == Error.INVALID_ARGUMENT
+    assert 'too many hours' in result.output
+    assert posted(post_func) == []
+
+  # So they're still queued as they were, rather than held back as maybe sent
+  assert [op.get('state') for op in journal.pending()] == [None, None]
+  with patch('jbstime.api.Timesheet.add_items') as add_items:
+    result = run('flush')
+    assert 'may already have been sent' not in result.output
+    add_items.assert_called_once()
+
+
+def test_local_commands(run, fs):
+  fs.create_dir(HOME())
+  run('projects')
+  run('--offline', 'add', '5/18/2020', 'Test Project', '8', 'Testing')
+
+  # Commands which only read local files don't send anything
+  with patch('jbstime.req.get', side_effect=AssertionError('offline')):
+    result = run('stats')
+    assert result.exit_code == 0
+    assert 'Sending' not in result.output
+
+    # A failed flush doesn't stop the command
+    result = run('holidays')
+    assert 'Couldn\'t send the queued changes: offline. Run `flush` to try again.' in result.output
+    assert len(journal.pending()) == 1
@@ -0,0 +1,63 @@
+import sys
+from unittest.mock import patch
+
+from jbstime import api
+from jbstime.config import HOME
+
+
+@patch('jbstime.client.spawn_refresh')
+def test_no_cache(mock_spawn, run):
+  result = run('--stale', 'timesheets')
+  assert result.exit_code == 0
+  assert 'refreshing in the background' not in result.output
+  mock_spawn.assert_not_called()
+
+
+@patch('jbstime.client.spawn_refresh')
+def test_stale(mock_spawn, run, fs):
+  fs.create_dir(HOME())
+  run('timesheet')
+
+  with patch('jbstime.api.Timesheet._load') as mock_load:
+    result = run('--stale', 'timesheets')
+    assert result.exit_code == 0
+    assert result.output.startswith('(Showing data from less than a minute ago, refreshing in the background)\n')
+    assert 'May 24, 2020   24.00  (unsubmitted)' in result.output
+
+    result = run('--stale', 'pto')
+    assert result.exit_code == 0
+    assert 'You are capped at 160 hours' in result.output
+
+    mock_load.assert_not_called()
+
+  assert mock_spawn.call_count == 2
+
+  result = run('timesheets')
+  assert 'refreshing' not in result.output
+  assert mock_spawn.call_count == 2
+
+
+def test_refresh(run, fs):
+  fs.create_dir(HOME())
+  result = run('refresh')
+  assert result.exit_code == 0
+  assert api.load_stale() is not None
+
+
+@patch('subprocess.Popen')
+def test_spawn_refresh(mock_popen, run, fs):
+  fs.create_dir(HOME())
+  run('timesheet')
+
+  result = run('--stale', '-u', 'someone', '-p', 'secret', 'timesheets')
+  assert result.exit_code == 0
+  mock_popen.assert_called_once()
+
+  # The refresh is the hidden command, run in a detached process which is
+  # given the username and password from the command line
+  args, kwargs = mock_popen.call_args
+  assert args[0][0] == sys.executable
+  assert args[0][-1] == 'refresh'
+  assert kwargs['env']['JBS_TIMETRACK_USER'] == 'someone'
+  assert kwargs['env']['JBS_TIMETRACK_PASS'] == 'secret'
+  assert kwargs['start_new_session']
@@ -5,6 +5,7 @@ from click.testing import CliRunner
 import pytest
 import requests_mock
 
+from jbstime import req
 from jbstime.api import _clear
 from jbstime.client import cli
 
@@ -54,6 +55,13 @@ def config(fs):
     yield
 
 
+@pytest.fixture(autouse=True)
+def limiter():
+  # A test that throttles the limiter mustn't slow down the tests after it
+  with patch('jbstime.req.limiter', req.Limiter()):
+    yield
+
+
 @pytest.fixture()
 def no_config(fs):
   with patch.dict('os.environ', {
@@ -0,0 +1,177 @@
+import asyncio
+from datetime import date
+from decimal import Decimal
+import pathlib
+from unittest.mock import patch
+
+import pytest
+
+from jbstime import aio
+from jbstime.error import Error
+
+
+# Read before the fake filesystem is set up
+PAGES = {
+  url: (pathlib.Path(__file__).parent / 'html' / filename).read_text()
+  for url, filename in [
+    ('/accounts/login/', 'login.html'),
+    ('/?all=1', 'index.html'),
+    ('/timesheet/27358/', '27358.html'),
+    ('/timesheet/27299/', '27358.html'),
+  ]
+}
+
+
+class FakeSite:
+  def __init__(self):
+    self.posts = []
+    self.in_flight = 0
+    self.most_in_flight = 0
+
+  async def __call__(self, session, method, url, **kw):
+    self.in_flight += 1
+    self.most_in_flight = max(self.most_in_flight, self.in_flight)
+    try:
+      await asyncio.sleep(0)
+      if method == 'POST':
+        self.posts.append((url, kw['data']))
+        if url == '/accounts/login/' and kw['data']['username'] == 'baduser':
+          return 'Your username and password didn\'t match', {}
+
+        return 'Success', {}
+
+      return PAGES[url], {'csrftoken': '**TOKEN**'}
+    finally:
+      self.in_flight -= 1
+
+
+@pytest.fixture()
+def site():
+  fake = FakeSite()
+  with patch('jbstime.aio.Session._request', new=lambda *args, **kw: fake(*args, **kw)):
+    yield fake
+
+
+def test_list_and_reload(site):
+  async def main():
+    session = aio.Session()
+    timesheets = await session.list()
+    await aio.gather((t.reload() for t in timesheets.values() if t.id in ('27358', '27299')), limit=2)
+    return session, timesheets
+
+  session, timesheets = asyncio.run(main())
+  latest = timesheets[date(2020, 5, 24)]
+  assert latest.id == '27358'
+  assert len(latest.items) == 5
+  assert timesheets[date(2020, 5, 17)].items == latest.items
+  assert latest.hours == sum(i.hours for i in latest.items)
+
+  # The login happened once, before anything else
+  assert [url for url, data in site.posts] == ['/accounts/login/']
+  assert site.most_in_flight == 2
+
+
+def test_add_delete_submit(site):
+  async def main():
+    session = aio.Session()
+    timesheet = await session.latest()
+    await timesheet.add_item(date(2020, 5, 18), 'test proj', '8', 'Testing', merge=False)
+    await timesheet.delete_item('1')
+    await timesheet.submit()
+    return timesheet
+
+  timesheet = asyncio.run(main())
+  assert timesheet.items is None
+  assert timesheet.locked
+
+  data = [data for url, data in site.posts[1:]]
+  assert data[0]['log_date'] == '05/18/2020'
+  assert data[0]['hours_worked'] == '8'
+  assert data[0]['csrfmiddlewaretoken'] == '**TOKEN**'
+  assert data[1]['action'] == 'delete'
+  assert data[2]['action'] == 'finalize'
+
+
+def test_errors(site):
+  async def add(*args):
+    timesheet = await aio.Session().latest()
+    await timesheet.add_item(date(2020, 5, 18), *args)
+
+  with pytest.raises(aio.APIError) as e:
+    asyncio.run(add('Test Project', 'foo', 'Testing'))
+  assert e.value.code == Error.INVALID_ARGUMENT
+  assert str(e.value) == 'Invalid hours: foo'
+
+  with pytest.raises(aio.APIError) as e:
+    asyncio.run(add('PTO', '8', 'Testing'))
+  assert str(e.value) == 'Ambiguous project: PTO could be any of JBS - PTO, JBS - PTO Exchange'
+
+  with pytest.raises(aio.APIError) as e:
+    asyncio.run(aio.Session(username='baduser').list())
+  assert e.value.code == Error.LOGIN_FAILED
+
+
+def test_pto_and_holidays(site):
+  async def main():
+    session = aio.Session()
+    return await session.pto(), await session.list_holidays()
+
+  pto, holidays = asyncio.run(main())
+  assert isinstance(pto.balance, Decimal)
+  assert holidays
+
+
+def test_http():
+  pytest.importorskip('aiohttp')
+  from aiohttp import web
+  from aiohttp.test_utils import TestServer
+
+  requests = []
+
+  async def page(request):
+    requests.append(('GET', request.path_qs, None, request.cookies.get('sessionid')))
+    if request.path == '/timesheet/1/':
+      return web.Response(status=503, reason='Unavailable')
+
+    response = web.Response(text=PAGES[request.path_qs], content_type='text/html')
+    response.set_cookie('csrftoken', '**TOKEN**')
+    return response
+
+  async def form(request):
+    data = dict(await request.post())
+    requests.append(('POST', request.path, data, request.headers.get('X-CSRFToken')))
+    response = web.Response(text='Success', content_type='text/html')
+    if request.path == '/accounts/login/':
+      response.set_cookie('sessionid', 'session')
+
+    return response
+
+  app = web.Application()
+  for url in ('/accounts/login/', '/', '/timesheet/27358/', '/timesheet/1/'):
+    app.router.add_get(url, page)
+    app.router.add_post(url, form)
+
+  async def main():
+    async with TestServer(app, host='localhost') as server:
+      async with aio.Session(site=str(server.make_url('')).rstrip('/')) as session:
+        timesheet = await session.latest()
+        await timesheet.reload()
+        await timesheet.delete_item('1')
+
+        with pytest.raises(aio.APIError) as e:
+          await aio.Timesheet(session, '1', None, None, None, False).reload()
+
+        return timesheet, e.value
+
+  timesheet, error = asyncio.run(main())
+  assert timesheet.items is None
+  assert str(error) == 'GET /timesheet/1/ failed: 503 Unavailable'
+
+  # The login's cookie is sent with everything after it, and posts carry the
+  # token from the page before them
+  login, *rest = [r for r in requests if r[0] == 'POST']
+  assert login[2]['username'] == 'user'
+  assert rest == [('POST', '/timesheet/27358/', {
+    'id': '1', 'action': 'delete', 'csrf_token': '**TOKEN**', 'csrfmiddlewaretoken': '**TOKEN**',
+  }, '**TOKEN**')]
+  assert [r[3] for r in requests if r[0] == 'GET'] == [None] + ['session'] * 4
@@ -1,8 +1,14 @@
-from unittest.mock import patch
+from datetime import date
+from decimal import Decimal
+from unittest.mock import Mock, patch
 
 import pytest
 
-from jbstime.api import _clear, pto, Timesheet
+from jbstime import cache
+from jbstime.api import (
+  _body, _clear, _parse, _parse_index, _parse_timesheet, list_projects, pto, Timesheet, TimesheetItem,
+)
+from jbstime.config import HOME
 from jbstime.error import Error
 
 
@@ -30,7 +36,11 @@ def test_from_user_date():
 
 
 def test_delete():
-  Timesheet.latest().delete_item('27358')
+  timesheet = Timesheet.latest()
+  item = next(iter(timesheet.items))
+  timesheet.delete_item(item.id)
+  assert timesheet._items is not None
+  assert item not in timesheet.items
 
 
 def test_submit():
@@ -42,5 +52,123 @@ def test_pto():
   pto()
 
 
+def verified_posts(func, *args):
+  # Runs func with every post failing, returning what its checks said about
+  # whether each one went through anyway
+  verified = []
+  with patch('jbstime.req.login'), \
+       patch('jbstime.req.post', side_effect=lambda url, data, **kw: verified.append(kw['verify']())):
+    func(*args)
+
+  return verified
+
+
+def test_verify_add():
+  _clear()
+  list_projects()
+  timesheet = Timesheet.latest()
+  old = TimesheetItem('1', Decimal('8'), date(2020, 5, 18), 'Test Project', 'Testing')
+  new = TimesheetItem('2', Decimal('8'), date(2020, 5, 18), 'Test Project', 'Testing')
+  entries = [(date(2020, 5, 18), 'Test Project', '8', 'Testing')]
+
+  with patch('jbstime.api.Timesheet._current_items') as current:
+    # An identical item that was there already doesn't count
+    timesheet._items = {old}
+    current.return_value = {old}
+    assert verified_posts(timesheet.add_items, entries * 2, False, False) == [False, False]
+
+    timesheet._items = {old}
+    current.return_value = {old, new}
+    assert verified_posts(timesheet.add_items, entries * 2, False, False) == [True, False]
+
+
+def test_verify_create_and_submit():
+  _clear()
+  Timesheet.list()
+
+  # The week was there before the post, so it wasn't the post that made it
+  assert verified_posts(Timesheet.create, date(2020, 5, 24)) == [False]
+
+  del Timesheet.list()[date(2020, 5, 24)]
+  assert verified_posts(Timesheet.create, date(2020, 5, 24)) == [True]
+
+  # Without knowing what was there before, the website is asked again
+  _clear()
+  assert verified_posts(Timesheet.create, date(2020, 5, 24)) == [False]
+
+  # Unless it's passed in, as it is for creates running side by side
+  assert verified_posts(Timesheet.create, date(2020, 5, 24), set()) == [True]
+
+  missing = Timesheet('1', date(2030, 5, 26), Decimal('0'), Decimal('0'), False)
+  assert verified_posts(missing.submit) == [False]
+
+
 def test_hash():
   hash(Timesheet.latest())
+
+
+def test_body():
+  r = Mock(content='café'.encode('latin-1'), headers={'Content-Type': 'text/html; charset=ISO-8859-1'})
+  content, encoding = _body(r)
+  assert (content, encoding) == ('café'.encode('latin-1'), 'ISO-8859-1')
+  assert content is r.content
+
+  # Without a charset, the page is taken to be UTF-8 rather than guessed at
+  r = Mock(content='<p>café'.encode(), headers={'Content-Type': 'text/html'})
+  content, encoding = _body(r)
+  assert encoding == 'utf-8'
+  assert _parse(content, encoding).p.string == 'café'
+
+
+def test_unchanged_pages(fs):
+  fs.create_dir(HOME())
+  _clear()
+  timesheets = Timesheet.list()
+  items = Timesheet.latest().items
+
+  with patch('jbstime.api._parse_index', wraps=_parse_index) as parse_index, \
+       patch('jbstime.api._parse_timesheet', wraps=_parse_timesheet) as parse_timesheet:
+    # A new run has nothing in memory, but the pages are the same
+    _clear()
+    assert Timesheet.list() == timesheets
+    assert Timesheet.list()[date(2020, 5, 24)].hours == timesheets[date(2020, 5, 24)].hours
+    assert pto() is not None
+
+    latest = Timesheet.latest()
+    latest.reload()
+    assert latest.items == items
+    assert latest.items is not items
+
+    parse_index.assert_not_called()
+    parse_timesheet.assert_not_called()
+
+    # Anything different is parsed again
+    with patch('jbstime.api._get') as mock_get:
+      mock_get.return_value.content = b'<p>changed'
+      mock_get.return_value.headers = {'Content-Type': 'text/html; charset=utf-8'}
+      with pytest.raises(AttributeError):
+        latest.reload()
+
+    parse_timesheet.assert_called_once()
+
+
+def test_old_format(fs):
+  fs.create_dir(HOME())
+  _clear()
+  Timesheet.latest().reload()
+  assert not list(HOME().glob('page-*.json'))
+
+  # Files saved in an older format are ignored, and the pages parsed again
+  for name in ('index', 'items'):
+    data = cache.load(name)
+    data['format'] -= 1
+    cache.save(name, data)
+
+  with patch('jbstime.api._parse_index', wraps=_parse_index) as parse_index, \
+       patch('jbstime.api._parse_timesheet', wraps=_parse_timesheet) as parse_timesheet:
+    _clear()
+    Timesheet.latest().reload()
+    parse_index.assert_called_once()
+    parse_timesheet.assert_called_once()
+
+  assert cache.load('items')['format'] == cache.FORMAT
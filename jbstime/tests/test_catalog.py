@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from jbstime import api, cache, catalog
+from jbstime.api import _clear, list_projects, Timesheet
+from jbstime.config import HOME
+from jbstime.error import Error
+
+
+def test_empty():
+  assert catalog.complete_project(None, None, '') == []
+  assert catalog.complete_date(None, None, '') == ['current']
+
+
+def test_complete(fs):
+  fs.create_dir(HOME())
+  _clear()
+  list_projects()
+
+  assert catalog.complete_project(None, None, 'jbs - pto') == ['JBS - PTO', 'JBS - PTO Exchange']
+  assert catalog.complete_project(None, None, 'test')[0] == 'Test Project'
+
+  dates = catalog.complete_date(None, None, '')
+  assert dates[:3] == ['current', '5/24/2020', '5/17/2020']
+  assert catalog.complete_date(None, None, '5/1') == ['5/17/2020', '5/10/2020']
+
+
+def test_index():
+  index = catalog.ProjectIndex(['Test Project', 'JBS - PTO', 'JBS - PTO Exchange', 'Wineshipping - Email Project'])
+  assert index.prefix('jbs') == [1, 2]
+  assert index.contains('project') == [0, 3]
+  assert index.contains('x') == [2]
+  assert index.similar('tset project') == [0]
+  assert index.similar('missing project') == []
+
+  assert index.match('JBS - PTO') == [1]
+  assert index.match('pto') == [1, 2]
+  assert index.match('exch') == [2]
+  assert index.match('nothing') == []
+
+
+def test_cached_projects(fs):
+  fs.create_dir(HOME())
+  _clear()
+  list_projects()
+
+  _clear()
+  with patch('jbstime.api.Timesheet.reload') as mock_reload:
+    assert list_projects()['test project'].name == 'Test Project'
+    mock_reload.assert_not_called()
+
+  assert catalog.load_projects(max_age=timedelta(seconds=-1)) is None
+
+
+def test_project_missing_from_catalog(fs):
+  fs.create_dir(HOME())
+  catalog.update(projects={'other': api.Project('1', 'Other', False)})
+
+  # A project added since the catalog was saved is found once the projects
+  # are loaded from the website
+  _clear()
+  with patch('jbstime.api.Timesheet.reload', wraps=Timesheet.latest().reload) as mock_reload:
+    assert api.find_project('Test Project').name == 'Test Project'
+    mock_reload.assert_called_once()
+
+  assert 'test project' in list_projects()
+
+  # Offline, the saved projects are all there is
+  _clear()
+  catalog.update(projects={'other': api.Project('1', 'Other', False)})
+  with pytest.raises(SystemExit) as e:
+    api.find_project('Test Project', offline=True)
+
+  assert e.value.code == Error.INVALID_ARGUMENT
+
+
+def test_concurrent_updates(fs):
+  fs.create_dir(HOME())
+  timesheets = [Timesheet(str(i), date(2020, 1, 5) + timedelta(weeks=i), 0, 0, False) for i in range(20)]
+  for ts in timesheets:
+    ts._items = set()
+
+  # Every thread loads, changes and saves the same files
+  threads = [threading.Thread(target=api._record_items, args=(ts,)) for ts in timesheets]
+  threads += [threading.Thread(target=catalog.update, kwargs={'weeks': {ts.date: ts.id}}) for ts in timesheets]
+  for t in threads:
+    t.start()
+
+  for t in threads:
+    t.join()
+
+  assert len(cache.load('items')['weeks']) == 20
+  assert len(cache.load('catalog')['weeks']) == 1
+  assert not list(HOME().glob('*.tmp'))
@@ -1,8 +1,8 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 import pytest
 
-from jbstime.dates import date_fmt, date_fmt_pad_day, date_from_user_date, find_sunday
+from jbstime.dates import date_fmt, date_fmt_pad_day, date_from_user_date, find_sunday, time_ago
 from jbstime.error import Error
 
 
@@ -29,3 +29,12 @@ def test_sunday():
   assert find_sunday(date(2000, 1, 1)) == sunday
   assert find_sunday(date(1999, 12, 30)) == sunday
   assert find_sunday(sunday) == sunday
+
+
+def test_time_ago():
+  now = datetime.now()
+  assert time_ago(now) == 'less than a minute ago'
+  assert time_ago(now - timedelta(minutes=1, seconds=5)) == '1 minute ago'
+  assert time_ago(now - timedelta(minutes=90)) == '90 minutes ago'
+  assert time_ago(now - timedelta(hours=5)) == '5 hours ago'
+  assert time_ago(now - timedelta(days=3)) == '3 days ago'
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from jbstime import ledger
+from jbstime.api import _clear, PTO, Timesheet, TimesheetItem
+from jbstime.config import HOME
+
+
+def test_no_cache():
+  _clear()
+  Timesheet.latest().reload()
+  assert ledger.load() is None
+
+
+def test_load(fs):
+  fs.create_dir(HOME())
+  _clear()
+  Timesheet.latest().reload()
+
+  entry = ledger.load()
+  assert entry.week == date(2020, 5, 24)
+  assert entry.pto.cap == 160
+  assert not entry.locked
+  assert entry.items == Timesheet.latest().items
+
+  assert ledger.load(max_age=timedelta(seconds=-1)) is None
+
+
+def test_forecast():
+  entry = ledger.Ledger(
+    pto=PTO(Decimal('9.5'), 10, Decimal('100'), Decimal('90.5'), 110),
+    week=date(2020, 5, 24),
+    items={TimesheetItem(1, Decimal('8.0'), date(2020, 5, 18), 'JBS - PTO', 'Vacation')},
+    locked=False,
+  )
+
+  weeks = ledger.forecast(entry, 3, weekly_hours=40)
+  assert [w.date for w in weeks] == [date(2020, 5, 31), date(2020, 6, 7), date(2020, 6, 14)]
+  assert f'{weeks[0].balance:.2f}' == '4.41'
+  assert not weeks[1].capped
+  assert weeks[2].balance == 10
+  assert weeks[2].capped
+
+
+def test_pto_forecast(run, fs):
+  fs.create_dir(HOME())
+  run('timesheet')
+
+  with patch('jbstime.api.Timesheet._load') as mock_load:
+    result = run('pto', '--forecast', '2')
+    mock_load.assert_not_called()
+
+  assert result.exit_code == 0
+  assert 'You are capped at 160 hours' in result.output
+  assert 'Forecast at 40 hours a week\n  May 31, 2020' in result.output
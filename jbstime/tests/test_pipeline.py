@@ -0,0 +1,72 @@
+import threading
+import time
+from unittest.mock import patch
+
+from jbstime import api, pipeline
+from jbstime.config import HOME
+
+
+def parse(body, encoding):
+  return body.decode(encoding).upper()
+
+
+def fetch(url):
+  return url.encode() * 100, 'ascii'
+
+
+def test_in_order():
+  urls = [f'/{i}' for i in range(20)]
+  with patch('jbstime.pipeline.MIN_PAGES_FOR_PROCESSES', 1):
+    results = list(pipeline.fetch_and_parse(urls, fetch, parse, max_pending_bytes=500))
+
+  assert results == [(url, url.upper() * 100) for url in urls]
+
+
+def test_skip():
+  def skip(url, body, encoding):
+    return 'same' if url == '/a' else None
+
+  results = pipeline.fetch_and_parse(['/a', '/b'], fetch, parse, skip=skip)
+  assert list(results) == [('/a', 'same'), ('/b', '/B' * 100)]
+
+
+def test_sync(fs):
+  fs.create_dir(HOME())
+  api._clear()
+  timesheets = [ts for ts in api.Timesheet.list().values() if ts.id in ('27358', '27299')]
+
+  with patch('jbstime.pipeline.MIN_PAGES_FOR_PROCESSES', 1):
+    done = list(api.sync(timesheets))
+
+  assert done == timesheets
+  assert len(done[0].items) == 5
+  assert done[0].items == done[1].items
+  assert 'test project' in api.list_projects()
+
+  # Pages which haven't changed aren't parsed again
+  api._clear()
+  with patch('jbstime.api._parse_timesheet_data') as parse_data:
+    assert len(next(api.sync(timesheets)).items) == 5
+    parse_data.assert_not_called()
+
+
+def test_budget():
+  # Bodies fetched at the same time never add up to more than the limit
+  budget = pipeline._Budget(500)
+  peak = []
+
+  def take(n):
+    budget.reserve(n)
+    peak.append(budget.pending)
+    time.sleep(0.01)
+    budget.release(n)
+
+  threads = [threading.Thread(target=take, args=(200,)) for _ in range(10)]
+  for t in threads:
+    t.start()
+
+  for t in threads:
+    t.join()
+
+  assert max(peak) <= 500
+  assert budget.pending == 0
@@ -0,0 +1,67 @@
+from datetime import date
+from unittest.mock import patch
+
+from jbstime import api, req, trace
+from jbstime.config import HOME
+
+
+def urls(func):
+  return [c[0][0] for c in func.call_args_list]
+
+
+def test_prefetch(run, fs):
+  fs.create_dir(HOME())
+  run('timesheets')
+
+  with patch('jbstime.req.get', wraps=req.get) as get_func:
+    result = run('timesheet', '5/24/2020')
+    assert result.exit_code == 0
+    assert urls(get_func).count('/?all=1') == 1
+    assert urls(get_func).count('/timesheet/27358/') == 1
+
+
+def test_prefetch_after_write(fs):
+  fs.create_dir(HOME())
+  api._clear()
+  api.Timesheet.list()
+
+  with patch('jbstime.req.get', wraps=req.get) as get_func:
+    api.prefetch_for(date(2020, 5, 20))
+    timesheet = api.Timesheet.list()[date(2020, 5, 24)]
+    timesheet.submit()
+    timesheet.reload()
+
+    # The prefetched page is from before the submit, so it's loaded again
+    assert urls(get_func).count('/timesheet/27358/') == 3
+
+
+def test_no_catalog():
+  api._clear()
+  with patch('jbstime.req.submit') as mock_submit:
+    api.prefetch_for(date(2020, 5, 20))
+    mock_submit.assert_called_once()
+    assert list(req._prefetched) == [('page', '/?all=1')]
+
+
+def test_prompts(run, no_config):
+  with patch('jbstime.trace._profile', trace.Profile()) as profile:
+    # The login form loads while the username and password are typed
+    result = run('delete', '5/24/2020', 'Test Project', '--all', input='user\npass\ny\n')
+    assert result.exit_code == 0
+
+  # One token for the login and one for the first delete
+  assert profile.counters['prefetched csrf tokens'] == 2
+
+
+def test_prompt_declined(run):
+  with patch('jbstime.req.post', wraps=req.post) as post_func:
+    result = run('submit', '5/24/2020', input='n')
+    assert result.exit_code == 0
+
+  # The page for the token was loaded during the prompt, but nothing was sent
+  assert [c[0][0] for c in post_func.call_args_list] == ['/accounts/login/']
+  assert list(req._prefetched) == [('token', '/timesheet/27358/')]
+
+  # A new run starts with nothing prefetched
+  api._clear()
+  assert not req._prefetched
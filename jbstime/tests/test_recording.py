@@ -0,0 +1,57 @@
+import json
+import pathlib
+from unittest.mock import patch
+
+import requests
+
+from jbstime.recording import ReplayAdapter, SCRUBBED, SITE, TOKEN
+
+
+def exchanges(path):
+  return [json.loads(f.read_text()) for f in sorted(path.glob('*.json'))]
+
+
+def test_record(run, fs):
+  path = pathlib.Path('/recording')
+
+  with patch('jbstime.req._session', requests.Session()):
+    result = run('--user', 'jdoe', '--pass', 'hunter2', '--record', str(path), 'timesheets')
+    assert result.exit_code == 0
+
+  recorded = exchanges(path)
+  assert [(e['method'], e['url']) for e in recorded] == [
+    ('GET', '/accounts/login/'),
+    ('POST', '/accounts/login/'),
+    ('GET', '/?all=1'),
+  ]
+
+  login = recorded[1]
+  assert login['form'] == {
+    'username': SCRUBBED,
+    'password': SCRUBBED,
+    'csrf_token': TOKEN,
+    'csrfmiddlewaretoken': TOKEN,
+  }
+  assert login['cookies'] == {'csrftoken': TOKEN}
+  assert all('hunter2' not in e['body'] and 'jdoe' not in e['body'] for e in recorded)
+  assert recorded[2]['body'].startswith('<')
+
+
+def test_replay(run, fs):
+  path = pathlib.Path('/recording')
+  with patch('jbstime.req._session', requests.Session()):
+    run('--record', str(path), 'timesheets')
+
+  adapter = ReplayAdapter(path)
+
+  def send(url):
+    return adapter.send(requests.Request('GET', SITE + url).prepare())
+
+  first = send('/?all=1')
+  assert first.status_code == 200
+  assert send('/?all=1').text == first.text
+  assert send('/accounts/login/').cookies['csrftoken'] == TOKEN
+
+  missing = send('/timesheet/1/')
+  assert missing.status_code == 404
+  assert missing.text == 'Nothing was recorded for GET /timesheet/1/'
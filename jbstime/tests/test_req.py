@@ -0,0 +1,84 @@
+from unittest.mock import patch
+
+import pytest
+import requests
+from requests.cookies import cookiejar_from_dict
+
+from jbstime import req
+
+
+def response(status, **headers):
+  r = requests.Response()
+  r.status_code = status
+  r._content = b'ok'
+  r.headers.update(headers)
+  r.cookies = cookiejar_from_dict({'csrftoken': '**TOKEN**'})
+  return r
+
+
+@pytest.fixture()
+def server():
+  with patch('jbstime.req.session') as mock_session, patch('jbstime.req.time.sleep') as mock_sleep:
+    mock_session.return_value.sleep = mock_sleep
+    yield mock_session.return_value
+
+
+def test_limiter():
+  limiter = req.Limiter(limit=4, maximum=6)
+  for _ in range(4):
+    limiter.acquire()
+
+  assert limiter.in_flight == 4
+  for _ in range(4):
+    limiter.release(ok=True)
+
+  assert 4.9 < limiter.limit < 5
+
+  limiter.acquire()
+  limiter.release(ok=False)
+  assert 2.4 < limiter.limit < 2.5
+
+  for _ in range(5):
+    limiter.acquire()
+    limiter.release(ok=False)
+
+  assert limiter.limit == 1
+
+
+def test_get_retries(server):
+  server.get.side_effect = [response(503), requests.ConnectionError(), response(200)]
+  assert req.get('/', check_login=False).status_code == 200
+  assert server.get.call_count == 3
+  assert server.sleep.call_count == 2
+
+
+def test_get_retry_after(server):
+  server.get.side_effect = [response(429, **{'Retry-After': '3'}), response(200)]
+  req.get('/', check_login=False)
+  server.sleep.assert_called_once_with(3)
+
+
+def test_get_gives_up(server):
+  server.get.side_effect = [response(500)] * (req.RETRIES + 1)
+  with pytest.raises(requests.HTTPError):
+    req.get('/', check_login=False)
+
+
+def test_post_not_retried(server):
+  server.get.return_value = response(200)
+  server.post.side_effect = [response(503), response(200)]
+  with pytest.raises(requests.HTTPError):
+    req.post('/timesheet/', {}, check_login=False)
+
+  assert server.post.call_count == 1
+
+
+def test_post_verified(server):
+  server.get.return_value = response(200)
+  server.post.side_effect = [requests.ConnectionError(), response(200)]
+  assert req.post('/timesheet/', {}, check_login=False, verify=lambda: True) is None
+  assert server.post.call_count == 1
+
+  server.post.side_effect = [requests.ConnectionError(), response(200)]
+  assert req.post('/timesheet/', {}, check_login=False, verify=lambda: False).status_code == 200
+  assert server.post.call_count == 3
@@ -0,0 +1,71 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from jbstime import search
+from jbstime.api import _clear, Timesheet
+from jbstime.config import HOME
+
+
+def rows(start, *descriptions):
+  return [
+    [str(i), '8.00', f'2020-05-{start + i:02}', 'Test Project', description]
+    for i, description in enumerate(descriptions)
+  ]
+
+
+def save_items(history):
+  search.cache.save('items', {'format': search.cache.FORMAT, 'weeks': history, 'digests': {}})
+
+
+def test_index(fs):
+  fs.create_dir(HOME())
+  history = {
+    '2020-05-17': rows(11, 'Architecture review', 'Deploy'),
+    '2020-05-24': rows(18, 'Architecture', 'Code review and architecture'),
+  }
+  save_items(history)
+  search.index_weeks(history)
+
+  hits = search.search('architecture')
+  assert [h.description for h in hits] == ['Code review and architecture', 'Architecture', 'Architecture review']
+  assert hits[0].date == date(2020, 5, 19)
+
+  hits = search.search('architecture review')
+  assert [h.description for h in hits][:2] == ['Code review and architecture', 'Architecture review']
+
+  assert [h.description for h in search.search('deploy')] == ['Deploy']
+  assert search.search('deploy', project='other') == []
+  assert search.search('architecture', end=date(2020, 5, 11))[0].hours == Decimal('8.00')
+  assert len(search.search('test', start=date(2020, 5, 12))) == 3
+
+  # Indexing a timesheet again replaces what was there
+  history['2020-05-17'] = rows(11, 'Planning')
+  save_items(history)
+  search.index_weeks({'2020-05-17': history['2020-05-17']})
+  assert search.search('deploy') == []
+  assert [h.description for h in search.search('planning')] == ['Planning']
+
+
+def test_sync_and_search(run, fs):
+  fs.create_dir(HOME())
+  result = run('search', 'architecture')
+  assert result.output == 'No timesheets have been saved yet. Run `sync` first.\n'
+
+  _clear()
+  timesheets = {d: ts for d, ts in Timesheet.list().items() if ts.id in ('27358', '27299')}
+  with patch('jbstime.api.Timesheet.list', return_value=timesheets):
+    result = run('sync')
+    assert result.exit_code == 0
+    assert result.output.endswith('Synced 2 timesheets\n')
+
+    result = run('sync')
+    assert result.output.endswith('Synced 1 timesheet\n')
+
+  with patch('jbstime.req.get', side_effect=AssertionError('offline')):
+    result = run('search', 'architecture', '--from', '5/15/2020', '--to', '5/15/2020')
+    assert result.exit_code == 0
+    assert result.output == 'May 15, 2020                    Test Project    8.00  Architecture\n' * 2
+
+    result = run('search', 'nothing')
+    assert result.output == 'No matching items\n'
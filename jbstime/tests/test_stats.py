@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from jbstime import stats
+from jbstime.config import HOME
+
+
+def test_percentile():
+  values = list(range(1, 101))
+  assert stats.percentile(values, 50) == 50
+  assert stats.percentile(values, 95) == 95
+  assert stats.percentile(values, 99) == 99
+  assert stats.percentile([7], 99) == 7
+
+
+def test_endpoint():
+  assert stats.endpoint('GET /timesheet/27358/') == 'GET /timesheet/<id>/'
+  assert stats.endpoint('GET /?all=1') == 'GET /'
+
+
+def test_record_and_show(run, fs):
+  fs.create_dir(HOME())
+
+  result = run('stats')
+  assert result.output == 'No stats have been recorded. Set JBSTIME_STATS to record them.\n'
+
+  with patch.dict('os.environ', {'JBSTIME_STATS': '1'}):
+    run('timesheets')
+    run('timesheet', '5/24/2020')
+    run('stats')
+
+  records = stats.load()
+  assert [r['command'] for r in records] == ['timesheets', 'timesheet']
+  assert records[1]['requests'] >= 3
+  assert 'GET /timesheet/<id>/' in records[1]['endpoints']
+  phases = records[0]['phases']
+  assert set(phases) == {'login', 'index', 'index parse', 'reload', 'reload parse', 'writes'}
+  assert phases['index'] >= phases['index parse']
+
+  result = run('stats')
+  lines = result.output.splitlines()
+  assert lines[0].split() == ['Command', 'Runs', 'p50', 'p95', 'p99', 'Requests', 'Cache', 'hits']
+  assert lines[1].split()[:2] == ['timesheet', '1']
+  assert lines[2].split()[:2] == ['timesheets', '1']
+  assert any(line.startswith('GET /timesheet/<id>/') for line in lines)
+
+
+def test_window():
+  old = (datetime.now() - timedelta(days=40)).isoformat()
+  new = datetime.now().isoformat()
+  records = [
+    {'at': old, 'command': 'add', 'ms': 100, 'requests': 4, 'hits': 0, 'endpoints': {}},
+    {'at': new, 'command': 'add', 'ms': 300, 'requests': 2, 'hits': 1, 'endpoints': {'GET /': [2, 50]}},
+  ]
+  commands, endpoints = stats.summarize(records, days=30)
+  assert commands == [stats.Summary('add', 1, 300, 300, 300, 2, 1)]
+  assert endpoints == [stats.Summary('GET /', 2, 25, 25, 25, None, None)]
@@ -0,0 +1,68 @@
+import io
+import json
+
+from jbstime import trace
+
+
+def test_hooks(run):
+  spans = []
+  trace.add_hook(spans.append)
+  try:
+    result = run('timesheet')
+  finally:
+    trace.remove_hook(spans.append)
+
+  assert result.exit_code == 0
+  names = [s.name for s in spans]
+  assert names[-1] == 'command timesheet'
+  assert 'login' in names
+  assert 'GET /accounts/login/' in names
+  assert 'POST /accounts/login/' in names
+  assert 'parse index' in names
+  assert 'parse timesheet' in names
+
+  get = next(s for s in spans if s.name == 'GET /timesheet/27358/')
+  assert get.args['status'] == 200
+  assert get.args['bytes'] > 0
+
+  command = spans[-1]
+  assert all(command.start <= s.start and s.duration <= command.duration for s in spans)
+
+
+def test_chrome_trace(fs):
+  chrome = trace.ChromeTrace()
+  trace.add_hook(chrome)
+  try:
+    with trace.span('outer', page=1):
+      with trace.span('inner'):
+        pass
+  finally:
+    trace.remove_hook(chrome)
+
+  chrome.write('trace.json')
+  events = json.load(open('trace.json'))['traceEvents']
+  assert [e['name'] for e in events] == ['inner', 'outer']
+  assert events[1]['args'] == {'page': '1'}
+  assert events[0]['ph'] == 'X'
+  assert events[1]['ts'] <= events[0]['ts']
+
+
+def test_profile():
+  profile = trace.Profile()
+  trace.add_hook(profile)
+  try:
+    for i in range(3):
+      with trace.span(f'GET /?all={i}'):
+        pass
+  finally:
+    trace.remove_hook(profile)
+
+  profile.count('http requests', 3)
+  profile.gauge('limit', 4)
+
+  out = io.StringIO()
+  profile.report(out)
+  assert 'GET /' in out.getvalue()
+  assert profile.spans['GET /'][0] == 3
+  assert 'http requests' in out.getvalue()
+  assert 'limit' in out.getvalue()
@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+import requests
+from urllib3 import HTTPResponse
+
+from jbstime import trace, transport
+
+
+def build(adapter, connection, **headers):
+  resp = HTTPResponse(body=b'', headers=headers, status=200, preload_content=False, connection=connection)
+  return adapter.build_response(requests.Request('GET', 'https://example.com/').prepare(), resp)
+
+
+def test_pooled_adapter():
+  adapter = transport.PooledAdapter(8)
+  assert adapter._pool_maxsize == 8
+  assert adapter._pool_block
+
+  first, second = object(), object()
+  with patch('jbstime.trace._profile', trace.Profile()) as profile:
+    build(adapter, first, **{'Content-Type': 'text/html', 'Content-Encoding': 'gzip'})
+    build(adapter, first, **{'Content-Type': 'text/html', 'Content-Encoding': 'gzip'})
+    r = build(adapter, second, **{'Content-Type': 'text/html'})
+
+  assert r.status_code == 200
+  assert profile.counters['http connections opened'] == 2
+  assert profile.counters['http uncompressed responses'] == 1
+  assert profile.gauges == {'http connection 1 requests': 2, 'http connection 2 requests': 1}
+
+
+def test_http2_fallback(capsys):
+  with patch.dict('os.environ', {'JBSTIME_HTTP2': '1'}), patch.dict('sys.modules', {'httpx': None}):
+    assert isinstance(transport.adapter(4), transport.PooledAdapter)
+
+  assert 'HTTP/2 needs httpx' in capsys.readouterr().err
@@ -0,0 +1,182 @@
+from collections import namedtuple
+from contextlib import contextmanager
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+
+Span = namedtuple('Span', 'name start duration thread args')
+
+_hooks = []
+_origin = time.perf_counter()
+
+
+def add_hook(hook):
+  """
+    Registers a function to be called with a Span each time one finishes.
+    Spans finish innermost first, and can finish on any thread.
+  """
+  _hooks.append(hook)
+
+
+def remove_hook(hook):
+  _hooks.remove(hook)
+
+
+@contextmanager
+def span(name, **args):
+  """
+    Times the enclosed block. The args dict is yielded so the block can add to
+    it, for instance with the size of a response.
+  """
+  if not _hooks:
+    yield args
+    return
+
+  start = time.perf_counter()
+  try:
+    yield args
+  finally:
+    finished = Span(name, start - _origin, time.perf_counter() - start, threading.get_ident(), args)
+    for hook in list(_hooks):
+      hook(finished)
+
+
+def count(name, value=1):
+  """
+    Adds to a named counter. Counters only show up in the profile summary,
+    and in what collect() gathers.
+  """
+  for profile in _profiles():
+    profile.count(name, value)
+
+
+def gauge(name, value):
+  """
+    Records the latest value of something, like a limit. Gauges only show up
+    in the profile summary.
+  """
+  for profile in _profiles():
+    profile.gauge(name, value)
+
+
+class ChromeTrace:
+  """
+    Collects spans as Chrome trace events, which can be loaded in
+    chrome://tracing or Perfetto.
+  """
+
+  def __init__(self):
+    self.events = []
+    self.lock = threading.Lock()
+
+  def __call__(self, span):
+    with self.lock:
+      self.events.append({
+        'name': span.name,
+        'ph': 'X',
+        'ts': round(span.start * 1e6),
+        'dur': round(span.duration * 1e6),
+        'pid': os.getpid(),
+        'tid': span.thread,
+        'args': {k: str(v) for k, v in span.args.items()},
+      })
+
+  def write(self, path):
+    with open(path, 'w') as f:
+      json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+class Profile:
+  """
+    Totals up the time spent in each kind of span, along with any counters
+    and gauges.
+  """
+
+  def __init__(self):
+    self.spans = {}
+    self.counters = {}
+    self.gauges = {}
+    self.lock = threading.Lock()
+
+  def __call__(self, span):
+    # Group requests by endpoint rather than by full url
+    name = span.name.split('?')[0]
+    with self.lock:
+      total = self.spans.setdefault(name, [0, 0.0])
+      total[0] += 1
+      total[1] += span.duration
+
+  def count(self, name, value):
+    with self.lock:
+      self.counters[name] = self.counters.get(name, 0) + value
+
+  def gauge(self, name, value):
+    with self.lock:
+      self.gauges[name] = value
+
+  def report(self, file=None):
+    file = file or sys.stderr
+    print('Profile:', file=file)
+    for name, (calls, seconds) in sorted(self.spans.items(), key=lambda x: -x[1][1]):
+      print(f'  {name:<40} {calls:>5}  {seconds * 1000:>9.1f} ms', file=file)
+
+    for name, value in sorted(self.counters.items()):
+      print(f'  {name:<40} {value:>5}', file=file)
+
+    for name, value in sorted(self.gauges.items()):
+      print(f'  {name:<40} {value:>5}', file=file)
+
+
+_profile = None
+
+# Profiles which aren't printed, from collect()
+_collectors = []
+
+
+def _profiles():
+  return ([_profile] if _profile is not None else []) + _collectors
+
+
+def enable_chrome_trace(path):
+  trace = ChromeTrace()
+  add_hook(trace)
+  atexit.register(trace.write, path)
+  return trace
+
+
+def enable_profile():
+  global _profile
+
+  if _profile is None:
+    _profile = Profile()
+    add_hook(_profile)
+    atexit.register(_profile.report)
+
+  return _profile
+
+
+def collect():
+  """
+    Starts gathering spans and counters into a Profile which isn't printed,
+    for code that wants the totals for itself.
+  """
+  profile = Profile()
+  add_hook(profile)
+  _collectors.append(profile)
+  return profile
+
+
+def stop_collecting(profile):
+  remove_hook(profile)
+  _collectors.remove(profile)
+
+
+if os.environ.get('JBSTIME_TRACE'):
+  enable_chrome_trace(os.environ['JBSTIME_TRACE'])
+
+if os.environ.get('JBSTIME_PROFILE'):
+  enable_profile()
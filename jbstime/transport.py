@@ -0,0 +1,97 @@
+import os
+import threading
+
+import click
+
+# Only req.session imports this module, so loading requests here doesn't slow
+# down shell completion
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.cookies import cookiejar_from_dict
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from . import trace
+
+
+def adapter(maxsize):
+  """
+    Returns the transport for the site. Setting a JBSTIME_HTTP2 environmental
+    variable sends everything over one HTTP/2 connection, if httpx is
+    installed (`pip install jbstime[http2]`).
+  """
+  if os.environ.get('JBSTIME_HTTP2'):
+    try:
+      return HTTP2Adapter(maxsize)
+    except ImportError:
+      click.echo('HTTP/2 needs httpx; install jbstime[http2]. Using HTTP/1.1.', err=True)
+
+  return PooledAdapter(maxsize)
+
+
+class PooledAdapter(HTTPAdapter):
+  """
+    An HTTPAdapter whose pool holds a kept-alive connection for every request
+    that can be in flight, so parallel requests don't queue behind each other
+    or pay for a new TLS handshake. It counts the requests sent on each
+    connection, and the responses which came back uncompressed.
+  """
+
+  def __init__(self, maxsize):
+    self.uses = {}
+    self._lock = threading.Lock()
+    super().__init__(pool_connections=1, pool_maxsize=maxsize, pool_block=True)
+
+  def build_response(self, req, resp):
+    connection = getattr(resp, 'connection', None)
+    if connection is not None:
+      with self._lock:
+        if id(connection) not in self.uses:
+          trace.count('http connections opened')
+
+        self.uses[id(connection)] = self.uses.get(id(connection), 0) + 1
+        for n, count in enumerate(self.uses.values(), 1):
+          trace.gauge(f'http connection {n} requests', count)
+
+    if not resp.headers.get('Content-Encoding') and resp.headers.get('Content-Type', '').startswith('text/'):
+      trace.count('http uncompressed responses')
+
+    return super().build_response(req, resp)
+
+
+class HTTP2Adapter(BaseAdapter):
+  """
+    Sends requests through httpx over HTTP/2, where they share a single
+    connection. httpx keeps the cookies and follows redirects itself.
+  """
+
+  def __init__(self, maxsize):
+    import httpx
+
+    super().__init__()
+    self.client = httpx.Client(
+      http2=True,
+      follow_redirects=True,
+      limits=httpx.Limits(max_connections=maxsize, max_keepalive_connections=maxsize),
+    )
+
+  def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+    kw = {'timeout': timeout} if timeout is not None else {}
+    body = request.body.encode() if isinstance(request.body, str) else request.body
+    r = self.client.request(request.method, request.url, headers=dict(request.headers), content=body, **kw)
+    trace.count(f'http {r.http_version} responses')
+
+    response = requests.Response()
+    response.status_code = r.status_code
+    response.reason = r.reason_phrase
+    response.headers = CaseInsensitiveDict(r.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = r.content
+    response.url = str(r.url)
+    response.request = request
+    response.cookies = cookiejar_from_dict(dict(r.cookies))
+    response.connection = self
+    return response
+
+  def close(self):
+    self.client.close()
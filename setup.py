@@ -15,7 +15,14 @@ setuptools.setup(
     'pyyaml',
   ],
   extras_require={
+      'aio': [
+        'aiohttp',
+      ],
+      'http2': [
+        'httpx[http2]',
+      ],
       'test': [
+        'aiohttp',
         'flake8',
         'pyfakefs',
         'pytest',